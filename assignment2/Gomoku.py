@@ -2,11 +2,18 @@
 # /usr/bin/python3
 # Set the path to your python3 above
 
-import signal
 from gtp_connection import GtpConnection
 from board_util import BLACK, GoBoardUtil, WHITE
 from board import GoBoard
-from alphabeta import call_alphabeta
+from alphabeta import call_alphabeta, iterative_deepening
+from pns import call_pns
+from parallel import call_parallel
+from lazysmp import call_lazy_smp
+from timemanager import TimeManager
+
+# solve backends, selected with the solver GTP command
+SOLVERS = {"alphabeta": call_alphabeta, "pns": call_pns,
+           "parallel": call_parallel, "lazysmp": call_lazy_smp}
 
 
 class Gomoku():
@@ -24,45 +31,56 @@ class Gomoku():
         """
         self.name = "GomokuAssignment2"
         self.version = 1.0
+        self.solver = "alphabeta"
+
+    def set_solver(self, solver):
+        """
+        Select the search used by solve, one of SOLVERS.
+        Returns whether solver is known.
+        """
+        if solver not in SOLVERS:
+            return False
+        self.solver = solver
+        return True
 
-    def get_move(self, board: GoBoard, color, time_limit, tt, hasher):
-        _, move = self.solve(board, time_limit, tt, hasher)
+    def get_move(self, board: GoBoard, color, time_limit, tt):
+        """
+        Deepen the search one ply at a time until time runs out and play
+        the move of the deepest completed iteration.
+        """
+        timer = TimeManager.for_command(time_limit)
+        board_copy = board.copy()
+        move = None
+        for _, _, best in iterative_deepening(board_copy, tt, timer):
+            move = best
 
         if move != None:
             return move
         else:
             return GoBoardUtil.generate_random_move(board, color)
 
-    def solve(self, board: GoBoard, time_limit, tt, hasher):
-        def timeout_handler(sig, frame):
-            raise TimeoutError
-
-        signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(time_limit)
+    def solve(self, board: GoBoard, time_limit, tt):
+        timer = TimeManager.for_command(time_limit)
         board_copy = board.copy()
-        try:
-            value, move = call_alphabeta(board_copy, tt, hasher)
-
-            if value == 0:
-                # draw
-                return "draw", move
-            if value > 0:
-                # win
-                if board.current_player == BLACK:
-                    return 'b', move
-                if board.current_player == WHITE:
-                    return 'w', move
-            else:
-                opponent = GoBoardUtil.opponent(board.current_player)
-                if opponent == BLACK:
-                    return 'b', None
-                if opponent == WHITE:
-                    return 'w', None
-
-        except TimeoutError:
+        value, move = SOLVERS[self.solver](board_copy, tt, timer)
+        if timer.stopped:
             return "unknown", None
-        finally:
-            signal.alarm(0)  # disable the alarm
+
+        if value == 0:
+            # draw
+            return "draw", move
+        if value > 0:
+            # win
+            if board.current_player == BLACK:
+                return 'b', move
+            if board.current_player == WHITE:
+                return 'w', move
+        else:
+            opponent = GoBoardUtil.opponent(board.current_player)
+            if opponent == BLACK:
+                return 'b', None
+            if opponent == WHITE:
+                return 'w', None
 
 
 def run():
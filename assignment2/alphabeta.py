@@ -1,47 +1,135 @@
 from board import GoBoard
-from board_util import GoBoardUtil
-from transpositiontable import TranspositionTable
-from zobrist import ZobristHash
+from transpositiontable import EXACT, LOWER, UPPER
+from moveorder import MoveOrderer
+from timemanager import NO_DEADLINE
 
+# value of a won position, the negation of
+# staticallyEvaluateForToPlay() for a lost one
+WIN_SCORE = 100000
+INFINITY = 10 * WIN_SCORE
+# half width of the aspiration window of iterative deepening
+ASPIRATION = 1000
 
-def storeResult(tt, code, result):
-    tt.store(code, result)
-    return result
 
-
-def alphabeta(state: GoBoard, alpha, beta, tt: TranspositionTable,
-              hasher: ZobristHash):
-    code = hasher.hash(GoBoardUtil.get_oneD_board(state))
-    result = tt.lookup(code)
-
-    if result != None:
-        return result
+def alphabeta(state: GoBoard, alpha, beta, depth, tt, orderer, ply=0,
+              timer=NO_DEADLINE):
+    """
+    Negamax alpha-beta search of depth plies. Positions at depth 0 are
+    scored by getHeuristicScore, so with depth >= the number of empty
+    points the search goes to the end of the game.
+    Every node orders its moves by orderer: the tt move first, then by
+    the static gain of quick_move_score, then killers and history.
+    Nodes searched to the end of the game share their tt entry with their
+    symmetric positions; getHeuristicScore is not symmetric, so the
+    others are keyed by their own hash_code.
+    Once timer expires the search returns right away without storing
+    anything, and its result means nothing.
+    Returns (value, best move).
+    """
+    if timer.expired():
+        return (0, None)
+    if depth >= len(state.empty_set):
+        code, sym = state.canonical_code()
+    else:
+        code, sym = state.hash_code(), 0
+    # tt moves are moves of the position with code
+    to_tt = state.geometry.symmetries[sym]
+    from_tt = state.geometry.inverse_symmetries[sym]
+    entry = tt.lookup(code)
+    tt_move = None
+    if entry != None:
+        score, flag, entry_depth, tt_move = entry
+        if tt_move != None:
+            tt_move = from_tt[tt_move]
+        if entry_depth >= depth:
+            if flag == EXACT:
+                return (score, tt_move)
+            if flag == LOWER and score >= beta:
+                return (beta, tt_move)
+            if flag == UPPER and score <= alpha:
+                return (alpha, tt_move)
 
     if state.endOfGame():
         result = (state.staticallyEvaluateForToPlay(), None)
-        storeResult(tt, code, result)
+        # the value of a finished game does not depend on the depth
+        tt.store(code, result[0], EXACT, len(state.empty_set), None)
         return result
+    if depth == 0:
+        return (state.getHeuristicScore(), None)
 
-    moves = state.bestMoves()
-    move = moves[0]
+    original_alpha = alpha
+    color = state.current_player
+    # the best move of an earlier search of this position goes first
+    moves = orderer.order(state.empty_set.points, ply, color, tt_move,
+                          state.quick_move_score)
+    best_move = moves[0]
 
-    for move in moves:
-        state.play_move(move, state.current_player)
-        (value, _) = alphabeta(state, -beta, -alpha, tt, hasher)
-        value = -value
+    for i, move in enumerate(moves):
+        state.play_move(move, color)
+        if i == 0:
+            (value, _) = alphabeta(state, -beta, -alpha, depth - 1, tt,
+                                   orderer, ply + 1, timer)
+            value = -value
+        else:
+            # principal variation search: only prove that move is no
+            # better than alpha, and search again if it is
+            (value, _) = alphabeta(state, -alpha - 1, -alpha, depth - 1, tt,
+                                   orderer, ply + 1, timer)
+            value = -value
+            if alpha < value < beta and not timer.stopped:
+                (value, _) = alphabeta(state, -beta, -alpha, depth - 1, tt,
+                                       orderer, ply + 1, timer)
+                value = -value
+        state.undoMove(move)
+        if timer.stopped:
+            return (alpha, best_move)
         if value > alpha:
             alpha = value
-            move = move
-        state.undoMove(move)
+            best_move = move
         if value >= beta:
-            result = (beta, move)
-            storeResult(tt, code, result)
-            return result
+            orderer.cutoff(move, ply, color, depth)
+            tt.store(code, beta, LOWER, depth, to_tt[move])
+            return (beta, move)
+
+    flag = EXACT if alpha > original_alpha else UPPER
+    tt.store(code, alpha, flag, depth, to_tt[best_move])
+    return (alpha, best_move)
+
 
-    result = (alpha, move)
-    storeResult(tt, code, result)
-    return result
+def call_alphabeta(rootState, tt, timer=NO_DEADLINE):
+    # the search always goes to the end of the game,
+    # so the depth is the number of empty points
+    orderer = MoveOrderer(rootState.maxpoint)
+    return alphabeta(rootState, -10000, 10000, len(rootState.empty_set), tt,
+                     orderer, 0, timer)
 
 
-def call_alphabeta(rootState, tt, hasher):
-    return alphabeta(rootState, -10000, 10000, tt, hasher)
+def iterative_deepening(rootState, tt, timer=NO_DEADLINE):
+    """
+    Search rootState one ply deeper at a time, up to the end of the game.
+    Every iteration starts from the moves the earlier ones stored in tt,
+    and searches a window around the value of the previous one first.
+    Yields (depth, value, move) after every completed iteration, so the
+    caller always has the best move found so far.
+    Stops early once the game is decided, once timer expires, discarding
+    the unfinished iteration, and before an iteration it would most
+    likely not finish in time.
+    """
+    orderer = MoveOrderer(rootState.maxpoint)
+    value = None
+    for depth in range(1, len(rootState.empty_set) + 1):
+        if value == None:
+            alpha, beta = -INFINITY, INFINITY
+        else:
+            alpha, beta = value - ASPIRATION, value + ASPIRATION
+        value, move = alphabeta(rootState, alpha, beta, depth, tt, orderer,
+                                0, timer)
+        if (value <= alpha or value >= beta) and not timer.stopped:
+            # the value is outside the window, search again with all of it
+            value, move = alphabeta(rootState, -INFINITY, INFINITY, depth,
+                                    tt, orderer, 0, timer)
+        if timer.stopped:
+            break
+        yield depth, value, move
+        if abs(value) >= WIN_SCORE or timer.soft_expired():
+            break
@@ -10,9 +10,18 @@ The board uses a 1-dimensional representation with padding
 """
 
 import numpy as np
+from geometry import get_geometry
+from zobrist import get_zobrist_hash
 from board_util import (GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS,
                         is_black_white, is_black_white_empty, coord_to_point,
-                        where1d, MAXSIZE, GO_POINT)
+                        where1d, MAXSIZE, GO_POINT, PointSet)
+# the getHeuristicScore of a window with own stones of the player to move
+# and other stones of the opponent, at own * 6 + other
+WINDOW_SCORES = np.array(
+    [10 ** own - 10 ** other if own == 0 or other == 0 else 0
+     for own in range(6) for other in range(6)], dtype=np.int64)
+WINDOW_SCORE_LIST = WINDOW_SCORES.tolist()
+
 """
 The GoBoard class implements a board and basic functions to play
 moves, check the end of the game, and count the acore at the end.
@@ -30,68 +39,6 @@ class GoBoard(object):
         """
         assert 2 <= size <= MAXSIZE
         self.reset(size)
-        self.calculate_rows_cols_diags()
-
-    def calculate_rows_cols_diags(self):
-        if self.size < 5:
-            return
-        # precalculate all rows, cols, and diags for 5-in-a-row detection
-        self.rows = []
-        self.cols = []
-        for i in range(1, self.size + 1):
-            current_row = []
-            start = self.row_start(i)
-            for pt in range(start, start + self.size):
-                current_row.append(pt)
-            self.rows.append(current_row)
-
-            start = self.row_start(1) + i - 1
-            current_col = []
-            for pt in range(start, self.row_start(self.size) + i, self.NS):
-                current_col.append(pt)
-            self.cols.append(current_col)
-
-        self.diags = []
-        # diag towards SE, starting from first row (1,1) moving right to (1,n)
-        start = self.row_start(1)
-        for i in range(start, start + self.size):
-            diag_SE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_SE.append(pt)
-                pt += self.NS + 1
-            if len(diag_SE) >= 5:
-                self.diags.append(diag_SE)
-        # diag towards SE and NE, starting from (2,1) downwards to (n,1)
-        for i in range(start + self.NS,
-                       self.row_start(self.size) + 1, self.NS):
-            diag_SE = []
-            diag_NE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_SE.append(pt)
-                pt += self.NS + 1
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_NE.append(pt)
-                pt += -1 * self.NS + 1
-            if len(diag_SE) >= 5:
-                self.diags.append(diag_SE)
-            if len(diag_NE) >= 5:
-                self.diags.append(diag_NE)
-        # diag towards NE, starting from (n,2) moving right to (n,n)
-        start = self.row_start(self.size) + 1
-        for i in range(start, start + self.size):
-            diag_NE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_NE.append(pt)
-                pt += -1 * self.NS + 1
-            if len(diag_NE) >= 5:
-                self.diags.append(diag_NE)
-        assert len(self.rows) == self.size
-        assert len(self.cols) == self.size
-        assert len(self.diags) == (2 * (self.size - 5) + 1) * 2
 
     def reset(self, size):
         """
@@ -104,21 +51,43 @@ class GoBoard(object):
         self.last_move = None
         self.last2_move = None
         self.current_player = BLACK
+        # winner is kept up to date by play_move, win_point made the five
+        self.winner = EMPTY
+        self.win_point = None
         self.maxpoint = size * size + 3 * (size + 1)
-        self.board = np.full(self.maxpoint, BORDER, dtype=GO_POINT)
-        self._initialize_empty_points(self.board)
-        self.calculate_rows_cols_diags()
+        # shared tables, the rows, cols, and diags for 5-in-a-row detection
+        self.geometry = get_geometry(size)
+        self.rows = self.geometry.rows
+        self.cols = self.geometry.cols
+        self.diags = self.geometry.diags
+        self.board = np.copy(self.geometry.empty_board)
+        self.empty_set = PointSet(self.maxpoint)
+        for point in self.geometry.points:
+            self.empty_set.add(point)
+        # XOR of the Zobrist keys of all stones, see hash_code
+        self.zobrist = get_zobrist_hash(size)
+        self.stone_key = 0
+        # the same for all 8 symmetries, see canonical_code
+        self.sym_key = 0
+        # the stones of each color in each heuristic window, and
+        # getHeuristicScore with each color to play, kept up to date by
+        # play_move and undoMove
+        num_windows = len(self.geometry.heuristic_windows)
+        self.window_counts = [None, [0] * num_windows, [0] * num_windows]
+        self.heuristic_totals = [0, 0, 0]
 
     def copy(self):
-        b = GoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
-        b.ko_recapture = self.ko_recapture
-        b.last_move = self.last_move
-        b.last2_move = self.last2_move
-        b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
+        """
+        Copy the board. The geometry tables never change, so they are
+        shared with the copy and only the stones are copied.
+        """
+        b = GoBoard.__new__(GoBoard)
+        b.__dict__.update(self.__dict__)
         b.board = np.copy(self.board)
+        b.empty_set = self.empty_set.copy()
+        b.window_counts = [None, list(self.window_counts[BLACK]),
+                           list(self.window_counts[WHITE])]
+        b.heuristic_totals = list(self.heuristic_totals)
         return b
 
     def get_color(self, point):
@@ -127,8 +96,32 @@ class GoBoard(object):
     def pt(self, row, col):
         return coord_to_point(row, col, self.size)
 
+    def hash_code(self):
+        """
+        64-bit Zobrist code of the position, including the player to move.
+        The stone part is updated incrementally by play_move and undoMove.
+        """
+        return self.stone_key ^ self.zobrist.to_play[self.current_player]
+
+    def canonical_code(self):
+        """
+        (code, symmetry): the smallest hash_code of the 8 rotations and
+        reflections of the position, and the symmetry that gives it.
+        Symmetric positions share their code, so a move m of this position
+        is stored as geometry.symmetries[symmetry][m], and a stored move m
+        is geometry.inverse_symmetries[symmetry][m] here.
+        """
+        return self.zobrist.canonical(self.sym_key, self.current_player)
+
     def undoMove(self, point):
+        self.stone_key ^= self.zobrist.array[point][self.board[point]]
+        self.sym_key ^= self.zobrist.sym_array[point][self.board[point]]
+        self._update_windows(point, int(self.board[point]), -1)
         self.board[point] = EMPTY
+        self.empty_set.add(point)
+        if point == self.win_point:
+            self.winner = EMPTY
+            self.win_point = None
         self.current_player = GoBoardUtil.opponent(self.current_player)
 
     def bestMoves(self):
@@ -136,13 +129,66 @@ class GoBoard(object):
         return sorted(arr, key=self.move_score, reverse=True)
 
     def move_score(self, move):
-        self.play_move(move, self.current_player)
-        score = -self.staticallyEvaluateForToPlay()
-        self.undoMove(move)
-        return score
+        """
+        -staticallyEvaluateForToPlay after the player to move plays move,
+        from the windows through move only, without playing it.
+        """
+        color = self.current_player
+        if self.winner != EMPTY or self._is_five_through(move, color):
+            return 100000
+        _, other_delta = self._window_deltas(move, color, 1)
+        return -(self.heuristic_totals[GoBoardUtil.opponent(color)]
+                 + other_delta)
+
+    def move_gain(self, move, color):
+        """
+        How much playing move changes getHeuristicScore for color.
+        Only the windows through move change, so this is much cheaper
+        than comparing two full evaluations.
+        """
+        return self._window_deltas(move, color, 1)[0]
+
+    def _window_deltas(self, point, color, change):
+        """
+        How much getHeuristicScore changes for color and for its opponent
+        when change (1 or -1) stones of color are added on point.
+        """
+        own_counts = self.window_counts[color]
+        other_counts = self.window_counts[GoBoardUtil.opponent(color)]
+        scores = WINDOW_SCORE_LIST
+        own_delta = 0
+        other_delta = 0
+        for index in self.geometry.point_heuristic_window_indices[point]:
+            own = own_counts[index]
+            other = other_counts[index]
+            new = own + change
+            own_delta += scores[new * 6 + other] - scores[own * 6 + other]
+            other_delta += scores[other * 6 + new] - scores[other * 6 + own]
+        return own_delta, other_delta
+
+    def _update_windows(self, point, color, change):
+        """
+        Add change (1 or -1) stones of color on point to the window counts
+        and the heuristic totals.
+        """
+        own_delta, other_delta = self._window_deltas(point, color, change)
+        self.heuristic_totals[color] += own_delta
+        self.heuristic_totals[GoBoardUtil.opponent(color)] += other_delta
+        counts = self.window_counts[color]
+        for index in self.geometry.point_heuristic_window_indices[point]:
+            counts[index] += change
+
+    def quick_move_score(self, move, color):
+        """
+        Cheap stand-in for move_score when ordering the moves of color:
+        a move that makes five comes first, the others by move_gain.
+        """
+        if self._is_five_through(move, color):
+            return 10 ** 9  # above any move_gain
+        return self.move_gain(move, color)
 
     def endOfGame(self):
-        if self.get_empty_points().size == 0 or self.detect_five_in_a_row() != EMPTY:
+        if len(self.empty_set) == 0 or self.detect_five_in_a_row() != EMPTY:
             return True
         return False
 
@@ -161,7 +207,7 @@ class GoBoard(object):
         Return:
             The empty points on the board
         """
-        return where1d(self.board == EMPTY)
+        return np.array(sorted(self.empty_set.points), dtype=GO_POINT)
 
     def get_color_points(self, color):
         """
@@ -175,17 +221,6 @@ class GoBoard(object):
         assert row <= self.size
         return row * self.NS + 1
 
-    def _initialize_empty_points(self, board):
-        """
-        Fills points on the board with EMPTY
-        Argument
-        ---------
-        board: numpy array, filled with BORDER
-        """
-        for row in range(1, self.size + 1):
-            start = self.row_start(row)
-            board[start:start + self.size] = EMPTY
-
     def is_eye(self, point, color):
         """
         Check if point is a simple eye for color
@@ -265,6 +300,10 @@ class GoBoard(object):
         opp_block = self._block_of(nb_point)
         if not self._has_liberty(opp_block):
             captures = list(where1d(opp_block))
+            for stone in captures:
+                self.stone_key ^= self.zobrist.array[stone][self.board[stone]]
+                self.sym_key ^= self.zobrist.sym_array[stone][self.board[stone]]
+                self.empty_set.add(stone)
             self.board[captures] = EMPTY
             if len(captures) == 1:
                 single_capture = nb_point
@@ -279,23 +318,48 @@ class GoBoard(object):
         return self.getHeuristicScore()
 
     def getHeuristicScore(self):
-        score = 0
-        opponent = GoBoardUtil.opponent(self.current_player)
-        lines = self.rows + self.cols + self.diags
-        for line in lines:
-            for i in range(len(line) - 5):
-                currentPlayerCount = 0
-                opponentCount = 0
-                # count the number of stones on each five-line
-                for p in line[i:i + 5]:
-                    if self.board[p] == self.current_player:
-                        currentPlayerCount += 1
-                    elif self.board[p] == opponent:
-                        opponentCount += 1
-                # Is blocked
-                if currentPlayerCount < 1 or opponentCount < 1:
-                    score += 10 ** currentPlayerCount - 10 ** opponentCount
-        return score
+        """
+        Sum over the heuristic windows of 10 ** (stones of the player to
+        move) - 10 ** (stones of the opponent), for the windows without
+        stones of both. Kept up to date by play_move and undoMove, so
+        this is O(1).
+        """
+        return self.heuristic_totals[self.current_player]
+
+    def scanHeuristicScore(self):
+        """
+        Full-board version of getHeuristicScore. All windows are gathered
+        and counted at once.
+        """
+        cells = self.board[self.geometry.heuristic_window_array]
+        own = np.count_nonzero(cells == self.current_player, axis=1)
+        other = np.count_nonzero(
+            cells == GoBoardUtil.opponent(self.current_player), axis=1)
+        return int(WINDOW_SCORES[own * 6 + other].sum())
+
+    def heuristic_scores(self, boards, players):
+        """
+        getHeuristicScore of a batch of positions of this size: boards is
+        a (number of positions, maxpoint) array of board colors, players
+        holds the player to move of each position.
+        """
+        cells = boards[:, self.geometry.heuristic_window_array]
+        players = np.asarray(players).reshape(-1, 1, 1)
+        own = np.count_nonzero(cells == players, axis=2)
+        other = np.count_nonzero(cells == GoBoardUtil.opponent(players),
+                                 axis=2)
+        return WINDOW_SCORES[own * 6 + other].sum(axis=1)
+
+    def child_heuristic_scores(self, moves):
+        """
+        getHeuristicScore of the positions after each of moves by the
+        player to move, all evaluated in one batch.
+        """
+        moves = np.asarray(moves, dtype=GO_POINT)
+        color = self.current_player
+        boards = np.repeat(self.board[np.newaxis, :], len(moves), axis=0)
+        boards[np.arange(len(moves)), moves] = color
+        return self.heuristic_scores(boards, GoBoardUtil.opponent(color))
 
     def play_move(self, point, color):
         """
@@ -313,6 +377,13 @@ class GoBoard(object):
         elif self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.empty_set.remove(point)
+        self.stone_key ^= self.zobrist.array[point][color]
+        self.sym_key ^= self.zobrist.sym_array[point][color]
+        self._update_windows(point, color, 1)
+        if self.winner == EMPTY and self._is_five_through(point, color):
+            self.winner = color
+            self.win_point = point
         self.current_player = GoBoardUtil.opponent(color)
         self.last2_move = self.last_move
         self.last_move = point
@@ -355,6 +426,34 @@ class GoBoard(object):
         """
         Returns BLACK or WHITE if any five in a row is detected for the color
         EMPTY otherwise.
+        Uses the winner maintained by play_move, so this is O(1).
+        """
+        return self.winner
+
+    def _is_five_through(self, point, color):
+        """
+        Check whether the stone of color on point is part of five in a row.
+        Only the four lines through point are looked at.
+        """
+        for shift in [1, self.NS, self.NS + 1, self.NS - 1]:
+            count = 1
+            p = point + shift
+            while self.board[p] == color:
+                count += 1
+                p += shift
+            p = point - shift
+            while self.board[p] == color:
+                count += 1
+                p -= shift
+            if count >= 5:
+                return True
+        return False
+
+    def find_five_in_a_row(self):
+        """
+        Full-board version of detect_five_in_a_row, scanning every row,
+        column and diagonal. Only needed for stones that were put on
+        the board without play_move.
         """
         for r in self.rows:
             result = self.has_five_in_list(r)
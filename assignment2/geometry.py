@@ -0,0 +1,157 @@
+"""
+geometry.py
+
+Read-only tables describing the points and lines of a board of a given
+size: rows, columns, diagonals, the 5- and 6-point windows along them,
+neighbors, coordinates and the symmetries of the board.
+They depend only on the board size, so get_geometry computes them once
+per size and every board and board copy of that size shares them.
+"""
+
+import numpy as np
+from board_util import EMPTY, BORDER, GO_POINT
+
+
+class BoardGeometry(object):
+    def __init__(self, size):
+        """
+        Precompute the tables for a board of given size.
+        Points use the padded 1-dimensional encoding of coord_to_point.
+        """
+        self.size = size
+        self.NS = size + 1
+        self.maxpoint = size * size + 3 * (size + 1)
+        self.empty_board = np.full(self.maxpoint, BORDER, dtype=GO_POINT)
+        self.points = []
+        # (row, col) of every point, None for BORDER points
+        self.coords = [None] * self.maxpoint
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                point = row * self.NS + col
+                self.empty_board[point] = EMPTY
+                self.points.append(point)
+                self.coords[point] = (row, col)
+        self.neighbors = [[] for _ in range(self.maxpoint)]
+        for point in self.points:
+            for nb in [point - 1, point + 1, point - self.NS, point + self.NS]:
+                if self.is_on_board(nb):
+                    self.neighbors[point].append(nb)
+        self._calculate_rows_cols_diags()
+        self.lines = self.rows + self.cols + self.diags
+        self.windows5 = self._windows(5)
+        self.windows6 = self._windows(6)
+        # lines (of length >= 5) through each point
+        self.point_lines = [[] for _ in range(self.maxpoint)]
+        for line in self.lines:
+            for point in line:
+                self.point_lines[point].append(line)
+        # the five-point windows GoBoard.getHeuristicScore scores, which
+        # leave out the last window of each line
+        self.heuristic_windows = []
+        for line in self.lines:
+            for i in range(len(line) - 5):
+                self.heuristic_windows.append(tuple(line[i:i + 5]))
+        # the indices into heuristic_windows of the windows through each point
+        self.point_heuristic_window_indices = [[]
+                                               for _ in range(self.maxpoint)]
+        for index, window in enumerate(self.heuristic_windows):
+            for point in window:
+                self.point_heuristic_window_indices[point].append(index)
+        # the same as a (number of windows, 5) index array into the board
+        self.heuristic_window_array = np.array(self.heuristic_windows,
+                                               dtype=GO_POINT).reshape(-1, 5)
+        self._calculate_symmetries()
+
+    def is_on_board(self, point):
+        return 0 <= point < self.maxpoint and self.empty_board[point] == EMPTY
+
+    def row_start(self, row):
+        return row * self.NS + 1
+
+    def _calculate_symmetries(self):
+        """
+        The 8 rotations and reflections of the board as point permutations:
+        symmetries[s][point] is where point goes under symmetry s, and
+        inverse_symmetries[s] maps it back. Symmetry 0 is the identity.
+        BORDER points are left in place.
+        """
+        n = self.size + 1
+        transforms = [
+            lambda r, c: (r, c),
+            lambda r, c: (c, n - r),
+            lambda r, c: (n - r, n - c),
+            lambda r, c: (n - c, r),
+            lambda r, c: (r, n - c),
+            lambda r, c: (n - r, c),
+            lambda r, c: (c, r),
+            lambda r, c: (n - c, n - r),
+        ]
+        self.symmetries = []
+        self.inverse_symmetries = []
+        for transform in transforms:
+            perm = list(range(self.maxpoint))
+            inverse = list(range(self.maxpoint))
+            for point in self.points:
+                row, col = transform(*self.coords[point])
+                perm[point] = row * self.NS + col
+                inverse[perm[point]] = point
+            self.symmetries.append(perm)
+            self.inverse_symmetries.append(inverse)
+
+    def _calculate_rows_cols_diags(self):
+        """
+        All rows and columns, and the diagonals long enough to hold
+        five in a row, in the order GoBoard has always used.
+        """
+        self.rows = []
+        self.cols = []
+        for i in range(1, self.size + 1):
+            start = self.row_start(i)
+            self.rows.append(list(range(start, start + self.size)))
+            start = self.row_start(1) + i - 1
+            self.cols.append(
+                list(range(start, self.row_start(self.size) + i, self.NS)))
+
+        self.diags = []
+        # diag towards SE, starting from first row (1,1) moving right to (1,n)
+        start = self.row_start(1)
+        for i in range(start, start + self.size):
+            self._add_diag(i, self.NS + 1)
+        # diag towards SE and NE, starting from (2,1) downwards to (n,1)
+        for i in range(start + self.NS, self.row_start(self.size) + 1,
+                       self.NS):
+            self._add_diag(i, self.NS + 1)
+            self._add_diag(i, -1 * self.NS + 1)
+        # diag towards NE, starting from (n,2) moving right to (n,n)
+        start = self.row_start(self.size) + 1
+        for i in range(start, start + self.size):
+            self._add_diag(i, -1 * self.NS + 1)
+
+    def _add_diag(self, start, shift):
+        diag = []
+        pt = start
+        while self.is_on_board(pt):
+            diag.append(pt)
+            pt += shift
+        if len(diag) >= 5:
+            self.diags.append(diag)
+
+    def _windows(self, length):
+        """ All runs of length consecutive points along the lines """
+        windows = []
+        for line in self.lines:
+            for i in range(len(line) - length + 1):
+                windows.append(tuple(line[i:i + length]))
+        return windows
+
+
+_geometries = {}
+
+
+def get_geometry(size):
+    """
+    The shared BoardGeometry for boards of given size.
+    """
+    if size not in _geometries:
+        _geometries[size] = BoardGeometry(size)
+    return _geometries[size]
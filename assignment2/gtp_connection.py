@@ -19,8 +19,8 @@ from board_util import (
     coord_to_point,
 )
 import re
-from transpositiontable import TranspositionTable
-from zobrist import ZobristHash
+from transpositiontable import (ArrayTranspositionTable,
+                                SharedTranspositionTable, DEFAULT_MAX_BYTES)
 
 
 class GtpConnection:
@@ -39,8 +39,8 @@ class GtpConnection:
         self.go_engine = go_engine
         self.board = board
         self.time_limit = 1
-        self.hasher = ZobristHash(self.board.size)
-        self.tt = TranspositionTable()
+        self.tt_bytes = DEFAULT_MAX_BYTES
+        self.tt = self.new_tt()
         self.oldBoardSize = self.board.size
 
         self.commands = {
@@ -59,6 +59,9 @@ class GtpConnection:
             "legal_moves": self.legal_moves_cmd,
             "timelimit": self.time_limit_cmd,
             "solve": self.solve_cmd,
+            "tt_size": self.tt_size_cmd,
+            "tt_stats": self.tt_stats_cmd,
+            "solver": self.solver_cmd,
             "gogui-rules_game_id": self.gogui_rules_game_id_cmd,
             "gogui-rules_board_size": self.gogui_rules_board_size_cmd,
             "gogui-rules_legal_moves": self.gogui_rules_legal_moves_cmd,
@@ -79,7 +82,10 @@ class GtpConnection:
             "play": (2, "Usage: play {b,w} MOVE"),
             "legal_moves": (1, "Usage: legal_moves {w,b}"),
             "timelimit": (1, "Usage: timelimit {interger i} 1<=i<=100"),
-            "solve": (0, "Usage: No argument")
+            "solve": (0, "Usage: No argument"),
+            "tt_size": (1, "Usage: tt_size {megabytes i} 1<=i"),
+            "tt_stats": (0, "Usage: No argument"),
+            "solver": (1, "Usage: solver {alphabeta, pns, parallel, lazysmp}")
         }
 
     def write(self, data):
@@ -193,8 +199,7 @@ class GtpConnection:
         """
         size = int(args[0])
         if size != self.board.size:
-            self.hasher = ZobristHash(size)
-            self.tt = TranspositionTable()
+            self.tt = self.new_tt()
         self.reset(size)
         self.respond()
 
@@ -245,9 +250,47 @@ class GtpConnection:
             self.time_limit = 1
         self.respond()
 
+    def tt_size_cmd(self, args):
+        """
+        Set the memory budget of the transposition table to args[0] MB.
+        This clears the table.
+        """
+        if not args[0].isdigit() or int(args[0]) < 1:
+            self.error("Usage: tt_size {megabytes i} 1<=i")
+            return
+        self.tt_bytes = int(args[0]) * 1024 * 1024
+        self.tt = self.new_tt()
+        self.respond()
+
+    def new_tt(self):
+        """
+        An empty transposition table of tt_bytes, in shared memory if the
+        lazysmp solver uses it, so that tt_stats covers all its workers.
+        """
+        if self.go_engine.solver == "lazysmp":
+            return SharedTranspositionTable(self.tt_bytes)
+        return ArrayTranspositionTable(self.tt_bytes)
+
+    def tt_stats_cmd(self, args):
+        """ Report hit, collision and fill statistics of the table """
+        self.respond(self.tt.stats())
+
+    def solver_cmd(self, args):
+        """
+        Select the search used by solve: alphabeta, pns, parallel or
+        lazysmp. Switching to or from lazysmp clears the table.
+        """
+        was_shared = self.go_engine.solver == "lazysmp"
+        if not self.go_engine.set_solver(args[0]):
+            self.error("Usage: solver {alphabeta, pns, parallel, lazysmp}")
+            return
+        if was_shared != (self.go_engine.solver == "lazysmp"):
+            self.tt = self.new_tt()
+        self.respond()
+
     def solve_cmd(self, args):
         outcome, move = self.go_engine.solve(self.board, self.time_limit,
-                                             self.tt, self.hasher)
+                                             self.tt)
 
         if move == None:
             self.respond("{}".format(outcome))
@@ -299,7 +342,7 @@ class GtpConnection:
         board_color = args[0].lower()
         color = color_to_int(board_color)
         move = self.go_engine.get_move(self.board, color, self.time_limit,
-                                       self.tt, self.hasher)
+                                       self.tt)
         move_coord = point_to_coord(move, self.board.size)
         move_as_string = format_point(move_coord)
         if self.board.is_legal(move, color):
@@ -0,0 +1,91 @@
+"""
+lazysmp.py
+
+Lazy SMP: several worker processes search the same root at the same
+time, sharing one SharedTranspositionTable. Every worker but the first
+orders equal moves a little differently, so the workers spread over
+different parts of the tree and mostly find the results of the others
+in the table instead of searching them again. The first worker to
+finish gives the answer and the others are stopped.
+
+Every worker stops at the deadline of the caller's timer by itself, and
+the main process stops waiting for an answer then and terminates them.
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+
+from board import GoBoard
+from alphabeta import alphabeta, WIN_SCORE
+from moveorder import MoveOrderer
+from transpositiontable import (SharedTranspositionTable, MAX_WORKERS,
+                                EXACT)
+from timemanager import TimeManager, NO_DEADLINE
+
+
+def _search(board, name, worker, deadline, results):
+    """
+    Worker process: search board to the end of the game with the shared
+    table called name, and put (value, move) in results if it finishes
+    before the perf_counter deadline.
+    """
+    # slot 0 of the table belongs to the process that made it
+    tt = SharedTranspositionTable(name=name, worker=worker + 1)
+    timer = TimeManager.until(deadline)
+    orderer = MoveOrderer(board.maxpoint)
+    if worker > 0:
+        orderer.perturb(random.Random(worker))
+    # a null window around 0 tells a win from a draw from a loss
+    value, move = alphabeta(board, -1, 1, len(board.empty_set), tt, orderer,
+                            0, timer)
+    if not timer.stopped:
+        results.put(((value > 0) - (value < 0), move))
+
+
+def call_lazy_smp(rootState: GoBoard, tt, timer=NO_DEADLINE,
+                  processes=None):
+    """
+    Solve rootState like call_alphabeta with processes workers, one per
+    CPU by default. The workers share tt if it is a
+    SharedTranspositionTable, and a new one otherwise.
+    Returns (value, move) with value WIN_SCORE, 0 or -WIN_SCORE for the
+    player to move, and move a winning or drawing move, or None.
+    The result means nothing if timer expires.
+    """
+    if rootState.endOfGame():
+        return rootState.staticallyEvaluateForToPlay(), None
+    shared = tt
+    if not isinstance(tt, SharedTranspositionTable):
+        shared = SharedTranspositionTable()
+    processes = min(processes or os.cpu_count() or 1, MAX_WORKERS - 1)
+    results = multiprocessing.Queue()
+    # worker 0 searches in plain move order, the others perturb it
+    workers = [multiprocessing.Process(
+                   target=_search,
+                   args=(rootState, shared.name, worker, timer.deadline,
+                         results),
+                   daemon=True)
+               for worker in range(processes)]
+    try:
+        for worker in workers:
+            worker.start()
+        value, move = results.get(timeout=timer.remaining())
+    except queue.Empty:
+        timer.stop()
+        return 0, None
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+    if value < 0:
+        move = None
+    value = value * WIN_SCORE
+    if shared is not tt:
+        code, sym = rootState.canonical_code()
+        tt.store(code, value, EXACT, len(rootState.empty_set),
+                 None if move is None
+                 else rootState.geometry.symmetries[sym][move])
+    return value, move
@@ -0,0 +1,133 @@
+"""
+parallel.py
+
+Root-parallel alpha-beta: the moves of the root are split over a pool of
+worker processes, which get around the GIL that keeps threads from
+sharing Python search work.
+
+Every worker holds its own copy of the root board and its own
+transposition table, kept for all the root moves it is given. Each root
+move is searched to the end of the game with a null window around 0,
+which is all it takes to tell a win from a draw from a loss. A win
+ends the search and stops the other workers as soon as all root moves
+before it in move order are back.
+
+Results are merged in root move order: the value is the best value of
+the root moves, and the move is the first root move in move order with
+that value. Neither depends on the order the workers finish in.
+
+Every worker stops at the deadline of the caller's timer by itself, and
+the main process stops waiting for results then and terminates the pool.
+"""
+
+import multiprocessing
+import os
+
+from board import GoBoard
+from alphabeta import alphabeta, WIN_SCORE
+from moveorder import MoveOrderer
+from transpositiontable import ArrayTranspositionTable, EXACT
+from timemanager import TimeManager, NO_DEADLINE
+
+# memory of the transposition table of each worker
+WORKER_TT_BYTES = 16 * 1024 * 1024
+
+# state of a worker process, set up once by _init_worker
+_board = None
+_tt = None
+_orderer = None
+_timer = None
+
+
+def _init_worker(board, deadline):
+    global _board, _tt, _orderer, _timer
+    _board = board
+    _tt = ArrayTranspositionTable(WORKER_TT_BYTES)
+    _orderer = MoveOrderer(board.maxpoint)
+    _timer = TimeManager.until(deadline)
+
+
+def _search_move(task):
+    """
+    Worker: the value of root move task = (index, move) for the player
+    to move at the root, -1, 0 or 1, or None if time ran out.
+    """
+    index, move = task
+    board = _board
+    board.play_move(move, board.current_player)
+    value, _ = alphabeta(board, -1, 1, len(board.empty_set), _tt, _orderer, 1,
+                         _timer)
+    board.undoMove(move)
+    if _timer.stopped:
+        return index, None
+    # finished games and table entries give values outside the window
+    return index, (value < 0) - (value > 0)
+
+
+def _first_win(values, is_win):
+    """
+    Index of the first root move in move order that wins, once every
+    earlier move has come back, else None.
+    """
+    for index, value in enumerate(values):
+        if value is None:
+            return None
+        if is_win(value):
+            return index
+    return None
+
+
+def root_moves(rootState: GoBoard):
+    """ The moves of rootState, best first by quick_move_score """
+    color = rootState.current_player
+    return sorted(rootState.empty_set.points,
+                  key=lambda move: rootState.quick_move_score(move, color),
+                  reverse=True)
+
+
+def call_parallel(rootState: GoBoard, tt, timer=NO_DEADLINE,
+                  processes=None):
+    """
+    Solve rootState like call_alphabeta with processes workers, one per
+    CPU by default. Returns (value, move) with value WIN_SCORE, 0 or
+    -WIN_SCORE for the player to move, and move a winning or drawing
+    move, or None. The result means nothing if timer expires.
+    """
+    code, sym = rootState.canonical_code()
+    depth = len(rootState.empty_set)
+    entry = tt.lookup(code)
+    if entry != None and entry[1] == EXACT and entry[2] >= depth:
+        move = entry[3]
+        if move != None:
+            move = rootState.geometry.inverse_symmetries[sym][move]
+        return entry[0], move
+    if rootState.endOfGame():
+        return rootState.staticallyEvaluateForToPlay(), None
+
+    moves = root_moves(rootState)
+    values = [None] * len(moves)
+    processes = min(processes or os.cpu_count() or 1, len(moves))
+    with multiprocessing.Pool(processes, _init_worker,
+                              (rootState, timer.deadline)) as pool:
+        # leaving the with block terminates the workers that still run
+        results = pool.imap_unordered(_search_move, enumerate(moves))
+        for _ in moves:
+            try:
+                index, value = results.next(timer.remaining())
+            except multiprocessing.TimeoutError:
+                value = None
+            if value is None:
+                timer.stop()
+                return 0, None
+            values[index] = value
+            if _first_win(values, lambda v: v > 0) is not None:
+                break
+
+    best = max(v for v in values if v is not None)
+    move = moves[values.index(best)]
+    value = best * WIN_SCORE
+    if best < 0:
+        move = None
+    tt.store(code, value, EXACT, depth,
+             None if move is None else rootState.geometry.symmetries[sym][move])
+    return value, move
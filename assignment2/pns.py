@@ -0,0 +1,213 @@
+"""
+pns.py
+
+Depth-first proof-number search (df-pn), an alternative to alpha-beta
+for solving positions.
+
+Proof-number search answers a yes/no question, here "can player winner
+force a win?". Every position gets a proof number, the number of
+positions that still have to be won to prove the answer yes, and a
+disproof number for no. The search always expands the position that
+needs the least work, so it focuses on the easiest proof instead of
+searching the moves in a fixed order. df-pn does this depth first and
+keeps only the proof and disproof numbers of visited positions in a
+table, which is cleared when it grows too big.
+
+Win/draw/loss is solved with two searches: one asks whether the player
+to move wins, and if not, one asks whether the opponent wins.
+
+Positions are keyed by GoBoard.hash_code. Positions that are proven or
+disproven are also stored in the shared transposition table, under
+GoBoard.canonical_code like the positions alpha-beta searches to the
+end, so the alpha-beta search can reuse them and the other way around.
+"""
+
+from board import GoBoard
+from board_util import GoBoardUtil
+from transpositiontable import EXACT, LOWER, UPPER
+from alphabeta import WIN_SCORE
+from timemanager import NO_DEADLINE
+
+INFINITY = 10 ** 9
+# a child is searched until its numbers grow (1 + EPSILON) times past
+# the second best child's, which avoids switching back and forth
+EPSILON = 0.25
+# table entries kept before the table is cleared
+MAX_TABLE_SIZE = 1000000
+
+
+class ProofNumberSearch(object):
+    def __init__(self, board: GoBoard, tt, winner, timer=NO_DEADLINE):
+        """
+        Search whether player winner can force a win from board, until
+        timer expires.
+        """
+        self.board = board
+        self.tt = tt
+        self.winner = winner
+        self.timer = timer
+        # the root is always searched, to find its best move
+        self.root_code = board.hash_code()
+        # hash code -> (proof number, disproof number)
+        self.table = {}
+
+    def _child_code(self, move):
+        """ hash_code of the position after the player to move plays move """
+        board = self.board
+        color = board.current_player
+        zobrist = board.zobrist
+        return (board.stone_key ^ zobrist.array[move][color]
+                ^ zobrist.to_play[GoBoardUtil.opponent(color)])
+
+    def _store(self, code, pn, dn, move):
+        if len(self.table) >= MAX_TABLE_SIZE:
+            self.table.clear()
+        self.table[code] = (pn, dn)
+        if pn != 0 and dn != 0:
+            return
+        # proven and disproven positions go to the shared table,
+        # as values for the player to move
+        to_move_is_winner = self.board.current_player == self.winner
+        depth = len(self.board.empty_set)
+        # keyed like the exact entries of alpha-beta, shared by symmetries
+        tt_code, sym = self.board.canonical_code()
+        tt_move = self.board.geometry.symmetries[sym][move]
+        if pn == 0:
+            score = WIN_SCORE if to_move_is_winner else -WIN_SCORE
+            self.tt.store(tt_code, score, EXACT, depth, tt_move)
+        else:
+            flag = UPPER if to_move_is_winner else LOWER
+            self.tt.store(tt_code, 0, flag, depth, tt_move)
+
+    def _known(self, code):
+        """
+        (proof number, disproof number) of a position that is solved,
+        because the game is over or by an earlier search, or None.
+        """
+        board = self.board
+        if board.endOfGame():
+            if board.detect_five_in_a_row() == self.winner:
+                return (0, INFINITY)
+            return (INFINITY, 0)
+        if code == self.root_code:
+            return None
+        entry = self.tt.lookup(board.canonical_code()[0])
+        if entry == None:
+            return None
+        score, flag, depth, _ = entry
+        if depth < len(board.empty_set):
+            return None
+        # what the entry proves for the player to move
+        wins = score > 0 and flag != UPPER
+        no_win = score <= 0 and flag != LOWER
+        loses = score < 0 and flag != LOWER
+        no_loss = score >= 0 and flag != UPPER
+        if board.current_player == self.winner:
+            if wins:
+                return (0, INFINITY)
+            if no_win:
+                return (INFINITY, 0)
+        else:
+            if loses:
+                return (0, INFINITY)
+            if no_loss:
+                return (INFINITY, 0)
+        return None
+
+    def _moves(self):
+        """
+        The moves worth searching: a win if there is one, else the block
+        of an opponent's five, else all moves best first.
+        """
+        board = self.board
+        color = board.current_player
+        opponent = GoBoardUtil.opponent(color)
+        points = board.empty_set.points
+        for move in points:
+            if board._is_five_through(move, color):
+                return [move]
+        for move in points:
+            # if there are two, every move loses, so one is enough
+            if board._is_five_through(move, opponent):
+                return [move]
+        return sorted(points, key=lambda move: board.move_gain(move, color),
+                      reverse=True)
+
+    def mid(self, pn_threshold, dn_threshold):
+        """
+        Search the current position until its proof number reaches
+        pn_threshold or its disproof number reaches dn_threshold.
+        Returns (proof number, disproof number, best move). Once the
+        timer expires it returns right away, and its numbers are not
+        stored.
+        """
+        board = self.board
+        if self.timer.expired():
+            return 1, 1, None
+        code = board.hash_code()
+        pn, dn = self.table.get(code, (1, 1))
+        if pn >= pn_threshold or dn >= dn_threshold:
+            return pn, dn, None
+        known = self._known(code)
+        if known != None:
+            self.table[code] = known
+            return known[0], known[1], None
+
+        is_or_node = board.current_player == self.winner
+        moves = self._moves()
+        while True:
+            numbers = [self.table.get(self._child_code(move), (1, 1))
+                       for move in moves]
+            pns = [n[0] for n in numbers]
+            dns = [n[1] for n in numbers]
+            if is_or_node:
+                pn = min(pns)
+                dn = min(INFINITY, sum(dns))
+                # the move with the smallest proof number goes next
+                own = pns
+            else:
+                pn = min(INFINITY, sum(pns))
+                dn = min(dns)
+                own = dns
+            best = own.index(min(own))
+            if pn >= pn_threshold or dn >= dn_threshold:
+                break
+            second = min(own[:best] + own[best + 1:], default=INFINITY)
+            if is_or_node:
+                child_pn_threshold = min(pn_threshold,
+                                         int(second * (1 + EPSILON)) + 1)
+                child_dn_threshold = dn_threshold - dn + dns[best]
+            else:
+                child_pn_threshold = pn_threshold - pn + pns[best]
+                child_dn_threshold = min(dn_threshold,
+                                         int(second * (1 + EPSILON)) + 1)
+            move = moves[best]
+            board.play_move(move, board.current_player)
+            child = self.mid(child_pn_threshold, child_dn_threshold)
+            board.undoMove(move)
+            if self.timer.stopped:
+                return 1, 1, None
+            # the table may have been cleared, keep the child's numbers
+            self.table[self._child_code(move)] = child[:2]
+        self._store(code, pn, dn, moves[best])
+        return pn, dn, moves[best]
+
+
+def call_pns(rootState: GoBoard, tt, timer=NO_DEADLINE):
+    """
+    Solve rootState like call_alphabeta: returns (value, move) with value
+    WIN_SCORE for a win of the player to move, 0 for a draw and
+    -WIN_SCORE for a loss. move is a winning or drawing move, or None.
+    The result means nothing if timer expires.
+    """
+    toplay = rootState.current_player
+    search = ProofNumberSearch(rootState, tt, toplay, timer)
+    pn, _, move = search.mid(INFINITY, INFINITY)
+    if pn == 0:
+        return WIN_SCORE, move
+    search = ProofNumberSearch(rootState, tt, GoBoardUtil.opponent(toplay),
+                               timer)
+    pn, _, move = search.mid(INFINITY, INFINITY)
+    if pn == 0:
+        return -WIN_SCORE, None
+    return 0, move
@@ -0,0 +1,114 @@
+#!/usr/local/bin/python3
+# /usr/bin/python3
+# Set the path to your python3 above
+
+import random
+import unittest
+from board_util import BLACK, WHITE, EMPTY, GoBoardUtil
+from board import GoBoard
+
+
+class HeuristicScoreTestCase(unittest.TestCase):
+    """
+    The heuristic totals GoBoard keeps up to date on play_move and undoMove
+    against a full scan of the board, on random games.
+    """
+
+    def assert_same_scores(self, goboard):
+        self.assertEqual(goboard.getHeuristicScore(), reference_score(goboard))
+        self.assertEqual(goboard.getHeuristicScore(),
+                         goboard.scanHeuristicScore())
+
+    def do_test_random_games(self, size, num_games):
+        rng = random.Random(size)
+        for _ in range(num_games):
+            goboard = GoBoard(size)
+            moves = list(goboard.geometry.points)
+            rng.shuffle(moves)
+            played = []
+            for move in moves:
+                goboard.play_move(move, goboard.current_player)
+                played.append(move)
+                self.assert_same_scores(goboard)
+                if goboard.winner != EMPTY:
+                    break
+            # take back some moves, in order, and check again
+            for _ in range(rng.randrange(len(played) + 1)):
+                goboard.undoMove(played.pop())
+                self.assert_same_scores(goboard)
+            copy = goboard.copy()
+            self.assert_same_scores(copy)
+
+    def test_size_5_random_games(self):
+        self.do_test_random_games(5, 20)
+
+    def test_size_7_random_games(self):
+        self.do_test_random_games(7, 20)
+
+    def test_size_10_random_games(self):
+        self.do_test_random_games(10, 5)
+
+    def test_move_score(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            goboard = GoBoard(7)
+            for move in rng.sample(goboard.geometry.points, rng.randrange(20)):
+                goboard.play_move(move, rng.choice([BLACK, WHITE]))
+            if goboard.winner != EMPTY:
+                continue
+            goboard.current_player = rng.choice([BLACK, WHITE])
+            for move in goboard.get_empty_points():
+                score = goboard.move_score(move)
+                color = goboard.current_player
+                goboard.play_move(move, color)
+                self.assertEqual(score, -goboard.staticallyEvaluateForToPlay())
+                self.assertEqual(goboard.getHeuristicScore(),
+                                 reference_score(goboard))
+                goboard.undoMove(move)
+                goboard.current_player = color
+
+    def test_move_gain(self):
+        rng = random.Random(2)
+        for _ in range(20):
+            goboard = GoBoard(9)
+            for move in rng.sample(goboard.geometry.points, rng.randrange(30)):
+                goboard.play_move(move, rng.choice([BLACK, WHITE]))
+            color = rng.choice([BLACK, WHITE])
+            goboard.current_player = color
+            before = reference_score(goboard)
+            for move in goboard.get_empty_points():
+                gain = goboard.move_gain(move, color)
+                goboard.play_move(move, color)
+                goboard.current_player = color
+                self.assertEqual(gain, reference_score(goboard) - before)
+                goboard.undoMove(move)
+                goboard.current_player = color
+
+
+"""Utility"""
+def reference_score(goboard):
+    """
+    getHeuristicScore the way it was first written: every window is
+    counted point by point.
+    """
+    score = 0
+    current = goboard.current_player
+    opponent = GoBoardUtil.opponent(current)
+    lines = goboard.rows + goboard.cols + goboard.diags
+    for line in lines:
+        for i in range(len(line) - 5):
+            currentPlayerCount = 0
+            opponentCount = 0
+            for p in line[i:i + 5]:
+                if goboard.board[p] == current:
+                    currentPlayerCount += 1
+                elif goboard.board[p] == opponent:
+                    opponentCount += 1
+            if currentPlayerCount < 1 or opponentCount < 1:
+                score += 10 ** currentPlayerCount - 10 ** opponentCount
+    return score
+
+
+"""Main"""
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ import random
 from gtp_connection import GtpConnection
 from board_util import GoBoardUtil, EMPTY
 from board import GoBoard
+from linepatterns import WINS, OPEN_FOURS, BLOCK_OPEN_FOURS
 import numpy as np
 
 
@@ -72,26 +73,7 @@ class Gomoku():
         """
         Check if the current player can win directly, return all winning moves if exist, [] otherwise.
         """
-        # current = player
-        opponent = GoBoardUtil.opponent(player)
-        winning_moves = []
-        for line in self.lines:
-            for i in range(len(line) - 4):
-                emptyPos = -1
-                for pos in line[i: i + 5]:  # get five consecutive positions in a line
-                    color = self.board.get_color(pos)
-                    if color == EMPTY:
-                        if emptyPos == -1:
-                            emptyPos = pos
-                        else:   # more than 1 empty pos in this line
-                            emptyPos = -1
-                            break
-                    elif color == opponent:
-                        emptyPos = -1
-                        break
-                if emptyPos != -1 and emptyPos not in winning_moves:
-                    winning_moves.append(emptyPos)
-        return winning_moves
+        return self.board.threats.moves(WINS, player)
 
     def checkBlockWin(self, player) -> List[int]:
         """
@@ -110,71 +92,14 @@ class Gomoku():
         Check if the current player can create an open four, i.e. .xxxx.,
         return all such moves if exist, [] otherwise.
         """
-        # current = self.board.current_player
-        opponent = GoBoardUtil.opponent(player)
-        winning_moves = []
-        for line in self.lines:
-            for i in range(len(line) - 5):  # get six consecutive positions in a line
-                # check if the first and the last are empty
-                if self.board.get_color(line[i]) != EMPTY or self.board.get_color(line[i + 5]) != EMPTY:
-                    continue
-                emptyPos = -1
-                for pos in line[i + 1: i + 5]:
-                    color = self.board.get_color(pos)
-                    if color == EMPTY:
-                        if emptyPos == -1:
-                            emptyPos = pos
-                        else:   # more than 1 empty pos in this line
-                            emptyPos = -1
-                            break
-                    elif color == opponent:
-                        emptyPos = -1
-                        break
-                if emptyPos != -1 and emptyPos not in winning_moves:
-                    winning_moves.append(emptyPos)
-        return winning_moves
+        return self.board.threats.moves(OPEN_FOURS, player)
 
     def checkBlockOpenFour(self, player: int) -> List[int]:
         """
         Check if the opponent can create an open four, return all blocking moves if exist, [] otherwise.
+        e.g. for |.XX.X., blocking moves can be 0, 3, 5, | indicates the border
         """
-        # current = self.board.current_player
-        opponent = GoBoardUtil.opponent(player)
-        blocking_moves = []
-        for line in self.lines:
-            for i in range(len(line) - 5):  # get six consecutive positions in a line
-                # check if the first and the last are empty
-                if self.board.get_color(line[i]) != EMPTY or self.board.get_color(line[i + 5]) != EMPTY:
-                    continue
-                emptyPos = -1
-                for pos in line[i + 1: i + 5]:
-                    color = self.board.get_color(pos)
-                    if color == EMPTY:
-                        if emptyPos == -1:
-                            emptyPos = pos
-                        else:   # more than 1 empty pos in this line
-                            emptyPos = -1
-                            break
-                    elif color == player:
-                        emptyPos = -1
-                        break
-                if emptyPos != -1:
-                    moves = [emptyPos]
-                    if i == 0:
-                        # e.g. for |.XX.X., blocking moves can be 0, 3, 5, | indicates the border
-                        moves.append(line[5])
-                        if emptyPos != line[1]:
-                            moves.append(line[0])
-                    elif i == len(line) - 6:
-                        # e.g. for .XX.X.|, blocking moves can be 0, 3, 5, | indicates the border
-                        moves.append(line[i])
-                        if emptyPos != line[i + 4]:
-                            moves.append(line[i + 5])
-                    for move in moves:
-                        if move not in blocking_moves:
-                            blocking_moves.append(move)
-
-        return blocking_moves
+        return self.board.threats.moves(BLOCK_OPEN_FOURS, player)
 
     def simulate(self, board: GoBoard, first_move: int, color: int) -> int:
         """
@@ -191,14 +116,18 @@ class Gomoku():
         num_wins = 0
         num_draws = 0
         for _ in range(self.NUM_SIMULATION):
-            board_copy = board.copy()
-            board_copy.play_move(first_move, color)
-            winner = board_copy.detect_five_in_a_row()
-            while winner == EMPTY and len(board_copy.get_empty_points()) != 0:
-                moves = self.generateRuleBasedMoves(board_copy, board_copy.current_player)[1]
-                random_move = random.choice(moves)
-                board_copy.play_move(random_move, board_copy.current_player)
-                winner = board_copy.detect_five_in_a_row()
+            mark = board.mark()
+            board.push(first_move, color)
+            winner = board.detect_five_in_a_row()
+            while winner == EMPTY and len(board.empty_set) != 0:
+                move_type, moves = self.generateRuleBasedMoves(board, board.current_player)
+                if move_type == "Random":
+                    random_move = board.empty_set.random_choice()
+                else:
+                    random_move = random.choice(moves)
+                board.push(random_move)
+                winner = board.detect_five_in_a_row()
+            board.pop_to(mark)
             if winner == color:
                 num_wins += 1
             elif winner == EMPTY:
@@ -210,14 +139,7 @@ class Gomoku():
         """
         Get the positions of each row, col, and diagonal.
         """
-        lines = []
-        for line in self.board.rows:
-            lines.append(line)
-        for line in self.board.cols:
-            lines.append(line)
-        for line in self.board.diags:
-            lines.append(line)
-        return lines
+        return self.board.geometry.lines
 
 
 def run():
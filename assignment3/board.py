@@ -10,6 +10,8 @@ The board uses a 1-dimensional representation with padding
 """
 
 import numpy as np
+from geometry import get_geometry
+from linepatterns import ThreatTracker
 from board_util import (
     GoBoardUtil,
     BLACK,
@@ -22,7 +24,8 @@ from board_util import (
     coord_to_point,
     where1d,
     MAXSIZE,
-    GO_POINT
+    GO_POINT,
+    PointSet
 )
 
 """
@@ -43,67 +46,6 @@ class GoBoard(object):
         """
         assert 2 <= size <= MAXSIZE
         self.reset(size)
-        self.calculate_rows_cols_diags()
-
-    def calculate_rows_cols_diags(self):
-        if self.size < 5:
-            return
-        # precalculate all rows, cols, and diags for 5-in-a-row detection
-        self.rows = []
-        self.cols = []
-        for i in range(1, self.size + 1):
-            current_row = []
-            start = self.row_start(i)
-            for pt in range(start, start + self.size):
-                current_row.append(pt)
-            self.rows.append(current_row)
-
-            start = self.row_start(1) + i - 1
-            current_col = []
-            for pt in range(start, self.row_start(self.size) + i, self.NS):
-                current_col.append(pt)
-            self.cols.append(current_col)
-
-        self.diags = []
-        # diag towards SE, starting from first row (1,1) moving right to (1,n)
-        start = self.row_start(1)
-        for i in range(start, start + self.size):
-            diag_SE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_SE.append(pt)
-                pt += self.NS + 1
-            if len(diag_SE) >= 5:
-                self.diags.append(diag_SE)
-        # diag towards SE and NE, starting from (2,1) downwards to (n,1)
-        for i in range(start + self.NS, self.row_start(self.size) + 1, self.NS):
-            diag_SE = []
-            diag_NE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_SE.append(pt)
-                pt += self.NS + 1
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_NE.append(pt)
-                pt += -1 * self.NS + 1
-            if len(diag_SE) >= 5:
-                self.diags.append(diag_SE)
-            if len(diag_NE) >= 5:
-                self.diags.append(diag_NE)
-        # diag towards NE, starting from (n,2) moving right to (n,n)
-        start = self.row_start(self.size) + 1
-        for i in range(start, start + self.size):
-            diag_NE = []
-            pt = i
-            while self.get_color(pt) == EMPTY:
-                diag_NE.append(pt)
-                pt += -1 * self.NS + 1
-            if len(diag_NE) >= 5:
-                self.diags.append(diag_NE)
-        assert len(self.rows) == self.size
-        assert len(self.cols) == self.size
-        assert len(self.diags) == (2 * (self.size - 5) + 1) * 2
 
     def reset(self, size):
         """
@@ -116,21 +58,39 @@ class GoBoard(object):
         self.last_move = None
         self.last2_move = None
         self.current_player = BLACK
+        # winner is kept up to date by play_move, win_point made the five
+        self.winner = EMPTY
+        self.win_point = None
         self.maxpoint = size * size + 3 * (size + 1)
-        self.board = np.full(self.maxpoint, BORDER, dtype=GO_POINT)
-        self._initialize_empty_points(self.board)
-        self.calculate_rows_cols_diags()
+        # shared tables, the rows, cols, and diags for 5-in-a-row detection
+        self.geometry = get_geometry(size)
+        self.rows = self.geometry.rows
+        self.cols = self.geometry.cols
+        self.diags = self.geometry.diags
+        self.board = np.copy(self.geometry.empty_board)
+        self.empty_set = PointSet(self.maxpoint)
+        for point in self.geometry.points:
+            self.empty_set.add(point)
+        # base-3 code of the stones on each line of geometry.lines,
+        # see linepatterns.py
+        self.line_codes = [0] * len(self.geometry.lines)
+        # win, open four and block points, kept up to date with line_codes
+        self.threats = ThreatTracker(self.geometry.lines)
+        # (point, player, last_move, last2_move) before every pushed move
+        self.move_stack = []
 
     def copy(self):
-        b = GoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
-        b.ko_recapture = self.ko_recapture
-        b.last_move = self.last_move
-        b.last2_move = self.last2_move
-        b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
+        """
+        Copy the board. The geometry tables never change, so they are
+        shared with the copy and only the stones are copied.
+        """
+        b = GoBoard.__new__(GoBoard)
+        b.__dict__.update(self.__dict__)
         b.board = np.copy(self.board)
+        b.empty_set = self.empty_set.copy()
+        b.line_codes = list(self.line_codes)
+        b.threats = self.threats.copy()
+        b.move_stack = list(self.move_stack)
         return b
 
     def get_color(self, point):
@@ -139,6 +99,64 @@ class GoBoard(object):
     def pt(self, row, col):
         return coord_to_point(row, col, self.size)
 
+    def undoMove(self, point):
+        self._update_line_codes(point, -int(self.board[point]))
+        self.board[point] = EMPTY
+        self.empty_set.add(point)
+        if point == self.win_point:
+            self.winner = EMPTY
+            self.win_point = None
+        self.current_player = GoBoardUtil.opponent(self.current_player)
+
+    def _update_line_codes(self, point, change):
+        """
+        Add change times the color to the lines through point, and update
+        the threats of those lines
+        """
+        codes = self.line_codes
+        for index, power in self.geometry.line_powers[point]:
+            codes[index] += change * power
+            self.threats.update(index, codes[index])
+
+    def push(self, point, color=None):
+        """
+        Play a move of color on point and record it on the move stack,
+        so that it can be taken back by pop or pop_to.
+        color defaults to the player to move.
+        Returns boolean: whether move was legal
+        """
+        state = (point, self.current_player, self.last_move, self.last2_move)
+        if color is None:
+            color = self.current_player
+        if not self.play_move(point, color):
+            return False
+        self.move_stack.append(state)
+        return True
+
+    def pop(self):
+        """
+        Take back the last move made by push, and return its point
+        """
+        point, player, last_move, last2_move = self.move_stack.pop()
+        self.undoMove(point)
+        self.current_player = player
+        self.last_move = last_move
+        self.last2_move = last2_move
+        return point
+
+    def mark(self):
+        """
+        Current height of the move stack, to be passed to pop_to later
+        """
+        return len(self.move_stack)
+
+    def pop_to(self, mark):
+        """
+        Take back all moves pushed since mark was taken
+        """
+        while len(self.move_stack) > mark:
+            self.pop()
+
     def is_legal(self, point, color):
         """
         Check whether it is legal for color to play on point
@@ -154,7 +172,7 @@ class GoBoard(object):
         Return:
             The empty points on the board
         """
-        return where1d(self.board == EMPTY)
+        return np.array(sorted(self.empty_set.points), dtype=GO_POINT)
 
     def get_color_points(self, color):
         """
@@ -168,17 +186,6 @@ class GoBoard(object):
         assert row <= self.size
         return row * self.NS + 1
 
-    def _initialize_empty_points(self, board):
-        """
-        Fills points on the board with EMPTY
-        Argument
-        ---------
-        board: numpy array, filled with BORDER
-        """
-        for row in range(1, self.size + 1):
-            start = self.row_start(row)
-            board[start: start + self.size] = EMPTY
-
     def is_eye(self, point, color):
         """
         Check if point is a simple eye for color
@@ -259,6 +266,8 @@ class GoBoard(object):
         if not self._has_liberty(opp_block):
             captures = list(where1d(opp_block))
             self.board[captures] = EMPTY
+            for stone in captures:
+                self.empty_set.add(stone)
             if len(captures) == 1:
                 single_capture = nb_point
         return single_capture
@@ -279,6 +288,11 @@ class GoBoard(object):
         elif self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self._update_line_codes(point, int(color))
+        self.empty_set.remove(point)
+        if self.winner == EMPTY and self._is_five_through(point, color):
+            self.winner = color
+            self.win_point = point
         self.current_player = GoBoardUtil.opponent(color)
         self.last2_move = self.last_move
         self.last_move = point
@@ -321,6 +335,34 @@ class GoBoard(object):
         """
         Returns BLACK or WHITE if any five in a row is detected for the color
         EMPTY otherwise.
+        Uses the winner maintained by play_move, so this is O(1).
+        """
+        return self.winner
+
+    def _is_five_through(self, point, color):
+        """
+        Check whether the stone of color on point is part of five in a row.
+        Only the four lines through point are looked at.
+        """
+        for shift in [1, self.NS, self.NS + 1, self.NS - 1]:
+            count = 1
+            p = point + shift
+            while self.board[p] == color:
+                count += 1
+                p += shift
+            p = point - shift
+            while self.board[p] == color:
+                count += 1
+                p -= shift
+            if count >= 5:
+                return True
+        return False
+
+    def find_five_in_a_row(self):
+        """
+        Full-board version of detect_five_in_a_row, scanning every row,
+        column and diagonal. Only needed for stones that were put on
+        the board without play_move.
         """
         for r in self.rows:
             result = self.has_five_in_list(r)
@@ -4,6 +4,7 @@ Utility functions for Go board.
 """
 
 import numpy as np
+from random import randrange
 import random
 
 """
@@ -106,6 +107,49 @@ def coord_to_point(row, col, boardsize):
     return NS * row + col
 
 
+class PointSet(object):
+    """
+    Set of board points with O(1) add, remove and random choice.
+    The points are stored densely in self.points, and self.index maps
+    each point to its position in self.points, or -1 if it is not in the set.
+    """
+
+    def __init__(self, maxpoint):
+        self.points = []
+        self.index = [-1] * maxpoint
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, point):
+        return self.index[point] != -1
+
+    def add(self, point):
+        if self.index[point] == -1:
+            self.index[point] = len(self.points)
+            self.points.append(point)
+
+    def remove(self, point):
+        i = self.index[point]
+        if i == -1:
+            return
+        last = self.points.pop()
+        if last != point:
+            self.points[i] = last
+            self.index[last] = i
+        self.index[point] = -1
+
+    def random_choice(self):
+        """ A uniformly random point of the set, which must not be empty """
+        return self.points[randrange(len(self.points))]
+
+    def copy(self):
+        s = PointSet(0)
+        s.points = list(self.points)
+        s.index = list(self.index)
+        return s
+
+
 class GoBoardUtil(object):
     @staticmethod
     def generate_legal_moves(board, color):
@@ -140,11 +184,9 @@ class GoBoardUtil(object):
         color : BLACK, WHITE
             the color to generate the move for.
         """
-        moves = board.get_empty_points()
-        if len(moves) == 0:
+        if len(board.empty_set) == 0:
             return PASS
-        np.random.shuffle(moves)
-        return moves[0]
+        return board.empty_set.random_choice()
 
     @staticmethod
     def generate_random_moves(board, use_eye_filter):
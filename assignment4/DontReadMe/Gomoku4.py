@@ -3,24 +3,20 @@
 # Set the path to your python3 above
 
 from gtp_connection import GtpConnection
-from board_util import GoBoardUtil, EMPTY
+from board_util import GoBoardUtil
 from simple_board import SimpleGoBoard
+from bit_board import BitGoBoard
 from mcts import MCTSEngine
+from threatsearch import find_threat_win
+from timemanager import NO_DEADLINE
 
 import random
+import sys
 import numpy as np
 
-def undo(board,move):
-    board.board[move]=EMPTY
-    board.current_player=GoBoardUtil.opponent(board.current_player)
-
-def play_move(board, move, color):
-    board.play_move_gomoku(move, color)
-
 def game_result(board):
     game_end, winner = board.check_game_end_gomoku()
-    moves = board.get_empty_points()
-    board_full = (len(moves) == 0)
+    board_full = (len(board.empty_set) == 0)
     if game_end:
         #return 1 if winner == board.current_player else -1
         return winner
@@ -69,15 +65,16 @@ class GomokuSimulationPlayer(object):
     
     def _do_playout(self, board, color_to_play):
         res=game_result(board)
-        simulation_moves=[]
+        mark=board.mark()
         while(res is None):
-            _ , candidate_moves = self.policy_moves(board, board.current_player)
-            playout_move=random.choice(candidate_moves)
-            play_move(board, playout_move, board.current_player)
-            simulation_moves.append(playout_move)
+            if self.playout_policy=='random':
+                playout_move=board.empty_set.random_choice()
+            else:
+                _ , candidate_moves = self.policy_moves(board, board.current_player)
+                playout_move=random.choice(candidate_moves)
+            board.push(playout_move)
             res=game_result(board)
-        for m in simulation_moves[::-1]:
-            undo(board, m)
+        board.pop_to(mark)
         if res == color_to_play:
             return 1.0
         elif res == 'draw':
@@ -86,22 +83,37 @@ class GomokuSimulationPlayer(object):
             assert(res == GoBoardUtil.opponent(color_to_play))
             return -1.0
 
-    def get_move(self, board: SimpleGoBoard, color_to_play: int) -> int:
+    def get_move(self, board: SimpleGoBoard, color_to_play: int,
+                 timer=NO_DEADLINE) -> int:
         """
         The genmove function called by gtp_connection.
-        returns the move to play.
+        returns the move to play, the best one found before timer expires.
+        A forced win found by threat-space search is played right away.
         """
-        move = self.mcts_engine.getMove(board)
+        move = find_threat_win(board, timer)
+        if move is not None:
+            return move
+        move = self.mcts_engine.getMove(board, timer)
         return move
 
 
-def run():
+def run(use_bitboard=False, store_path=None):
     """
     start the gtp connection and wait for commands.
+    use_bitboard selects the bitboard implementation of the board.
+    store_path is the file of the solved position store, if any.
     """
-    board = SimpleGoBoard(7)
-    con = GtpConnection(GomokuSimulationPlayer(), board)
+    if use_bitboard:
+        board = BitGoBoard(7)
+    else:
+        board = SimpleGoBoard(7)
+    con = GtpConnection(GomokuSimulationPlayer(), board,
+                        store_path=store_path)
     con.start_connection()
 
 if __name__=='__main__':
-    run()
+    args = sys.argv[1:]
+    store_path = None
+    if '--store' in args:
+        store_path = args[args.index('--store') + 1]
+    run('--bitboard' in args, store_path)
@@ -1,79 +1,121 @@
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER
+from transpositiontable import EXACT, LOWER, UPPER
+from moveorder import MoveOrderer
+from threatsearch import find_threat_win
+from timemanager import NO_DEADLINE
 #from profilehooks import profile
 
-def undo(board,move):
-    board.board[move]=EMPTY
-    board.current_player=GoBoardUtil.opponent(board.current_player)
-
 def game_end(board):
     game_end, winner = board.check_game_end_gomoku()
-    moves = board.get_empty_points()
-    board_full = (len(moves) == 0)
+    board_full = (len(board.empty_set) == 0)
     if game_end:
         return 1 if winner == board.current_player else -1
     if board_full:
         return 0
     return None
 
-def alphabeta(board,alpha,beta):
+def alphabeta(board,alpha,beta,tt,orderer,ply,timer=NO_DEADLINE):
     #print(GoBoardUtil.get_twoD_board(board),alpha,beta)
+    # out of time: return right away, the result is thrown away
+    if timer.expired():
+        return 0
     result=game_end(board)
     if (result!=None):
         return result
+    # symmetric positions have the same value and share one entry
+    code,sym=board.canonical_code()
+    to_tt=board.geometry.symmetries[sym]
+    from_tt=board.geometry.inverse_symmetries[sym]
+    # the search always goes to the end of the game,
+    # so the remaining depth is the number of empty points
+    depth=len(board.empty_set)
+    entry=tt.lookup(code)
+    tt_move=None
+    if entry!=None:
+        score,flag,entry_depth,tt_move=entry
+        if tt_move!=None:
+            tt_move=from_tt[tt_move]
+        if entry_depth>=depth:
+            if flag==EXACT:
+                return score
+            if flag==LOWER and score>=beta:
+                return beta
+            if flag==UPPER and score<=alpha:
+                return alpha
+    original_alpha=alpha
     solvePoint=board.list_solve_point()
     if solvePoint:
-        #print(solvePoint[0])
-        board.play_move_gomoku(solvePoint[0],board.current_player)
-        result=-alphabeta(board,-beta,-alpha)
+        # the forced move that comes first in the canonical position, so
+        # that all symmetric positions search the same move and the value
+        # they share in tt does not depend on their orientation
+        moves=[min(solvePoint,key=lambda m: to_tt[m])]
+    else:
+        moves=orderer.order(board.empty_set.points,ply,board.current_player,tt_move)
+    best_move=moves[0]
+    for i,m in enumerate(moves):
+        board.push(m)
+        if i==0:
+            result=-alphabeta(board,-beta,-alpha,tt,orderer,ply+1,timer)
+        else:
+            # principal variation search: null window first,
+            # full window again only if m beats alpha
+            result=-alphabeta(board,-alpha-1,-alpha,tt,orderer,ply+1,timer)
+            if alpha<result<beta and not timer.stopped:
+                result=-alphabeta(board,-beta,-alpha,tt,orderer,ply+1,timer)
+        if timer.stopped:
+            board.pop()
+            return alpha
         if(result>alpha):
             alpha=result
-        undo(board,solvePoint[0])
+            best_move=m
+        board.pop()
         if(result>=beta):
+            orderer.cutoff(m,ply,board.current_player,depth)
+            tt.store(code,beta,LOWER,depth,to_tt[m])
             return beta
-    else:
-        for m in GoBoardUtil.generate_legal_moves_gomoku(board):
-            board.play_move_gomoku(m,board.current_player)
-            result=-alphabeta(board,-beta,-alpha)
-            if(result>alpha):
-                alpha=result
-            undo(board,m)
-            if(result>=beta):
-                return beta
+    flag=EXACT if alpha>original_alpha else UPPER
+    tt.store(code,alpha,flag,depth,to_tt[best_move])
     return alpha
 
 #@profile
 """
-if have winning move, return _,winning_move
-else return have_draw,"NoMove"
+if have winning move, return _,winning_move,None
+else return have_draw,"NoMove",draw_move
+the result means nothing if timer expires
 """
-def solve(board):
+def solve(board,tt,orderer=None,timer=NO_DEADLINE):
     result=game_end(board)
     if (result!=None):
-        return result,"First"
+        return result,"First",None
+    # most decisive positions are won by a sequence of threats
+    move=find_threat_win(board,timer)
+    if move is not None:
+        return True,move,None
     alpha,beta=-1,1
+    if orderer is None:
+        orderer=MoveOrderer(board.maxpoint)
     haveDraw=False
+    drawMove=None
     solvePoint=board.list_solve_point()
     if solvePoint:
         #print(solvePoint[0])
-        board.play_move_gomoku(solvePoint[0],board.current_player)
-        result=-alphabeta(board,-beta,-alpha)
-        undo(board,solvePoint[0])
+        moves=[solvePoint[0]]
+    else:
+        moves=GoBoardUtil.generate_legal_moves_gomoku(board)
+    for m in moves:
+        board.push(m)
+        result=-alphabeta(board,-beta,-alpha,tt,orderer,1,timer)
+        #print(GoBoardUtil.get_twoD_board(board))
+        #print(result)
+        board.pop()
+        if timer.stopped:
+            return False,"NoMove",None
         if(result==1):
-            return True,solvePoint[0]
-        elif(result==0):
+            return True,m,None
+        elif(result==0 and not haveDraw):
             haveDraw=True
-    else: 
-        for m in GoBoardUtil.generate_legal_moves_gomoku(board):
-            board.play_move_gomoku(m,board.current_player)
-            result=-alphabeta(board,-beta,-alpha)
-            #print(GoBoardUtil.get_twoD_board(board))
-            #print(result)
-            undo(board,m)
-            if(result==1):
-                return True,m
-            elif(result==0):
-                haveDraw=True
-    return haveDraw,"NoMove"
+            drawMove=m
+    return haveDraw,"NoMove",drawMove
 
 
     """
@@ -0,0 +1,189 @@
+"""
+bit_board.py
+
+Implements a Gomoku board that stores the stones in two Python integer
+bitboards, one per color, instead of a numpy array.
+
+Bit p of a bitboard stands for point p of the padded 1-dimensional
+representation used by SimpleGoBoard, so point numbers are shared
+between both boards. The padding points never hold a stone, so shifting
+a bitboard by one of the four direction offsets can never carry a line
+around the edge of the board.
+
+A plain list with the color of every point is kept next to the
+bitboards. get_color and the pattern automaton read it, since looking a
+point up in a list is cheaper than testing its bit in Python.
+"""
+
+import numpy as np
+from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, \
+                       PASS, is_black_white, PointSet
+from simple_board import SimpleGoBoard
+from geometry import get_geometry
+from linepatterns import ThreatTracker
+from zobrist import get_zobrist_hash
+
+class BitGoBoard(SimpleGoBoard):
+    """
+    Drop-in replacement for SimpleGoBoard in the Gomoku engines.
+    Only the gomoku part of the board interface is supported:
+    play_move_gomoku, undoMove, get_empty_points, check_game_end_gomoku
+    and the pattern functions built on top of get_color.
+    """
+    def reset(self, size):
+        """
+        Creates a start state, an empty board with the given size
+        """
+        self.size = size
+        self.NS = size + 1
+        self.WE = 1
+        self.ko_recapture = None
+        self.current_player = BLACK
+        self.winner = EMPTY
+        self.win_point = None
+        self.maxpoint = size * size + 3 * (size + 1)
+        # shift offsets of the four line directions: -, |, \ and /
+        self.directions = [1, self.NS, self.NS + 1, self.NS - 1]
+        self.geometry = get_geometry(size)
+        self.neighbors = self.geometry.neighbors
+        # the bit of each point
+        self.masks = [1 << point for point in range(self.maxpoint)]
+        self.on_board = 0
+        self.empty_set = PointSet(self.maxpoint)
+        for point in self.geometry.points:
+            self.on_board |= self.masks[point]
+            self.empty_set.add(point)
+        # the color of each point, kept up to date with the bitboards for
+        # the pattern automaton, see color_list
+        self.colors = self.geometry.empty_board.tolist()
+        # stones of each color, indexed by BLACK and WHITE
+        self.bits = [0, 0, 0]
+        self.zobrist = get_zobrist_hash(size)
+        self.stone_key = 0
+        # the same for all 8 symmetries, see canonical_code
+        self.sym_key = 0
+        # base-3 code of the stones on each line of geometry.lines,
+        # see linepatterns.py
+        self.line_codes = [0] * len(self.geometry.lines)
+        # win, open four and block points, kept up to date with line_codes
+        self.threats = ThreatTracker(self.geometry.lines)
+        self.move_stack = []
+
+    def copy(self):
+        b = BitGoBoard.__new__(BitGoBoard)
+        b.__dict__.update(self.__dict__)
+        b.bits = list(self.bits)
+        b.colors = list(self.colors)
+        b.empty_set = self.empty_set.copy()
+        b.line_codes = list(self.line_codes)
+        b.threats = self.threats.copy()
+        b.move_stack = list(self.move_stack)
+        return b
+
+    @property
+    def board(self):
+        """
+        The board as a numpy array in the SimpleGoBoard encoding.
+        It is built on demand, so it is meant for display only.
+        """
+        return np.array(self.colors, dtype = np.int32)
+
+    def color_list(self):
+        """ The colors of all points, no copy, do not modify """
+        return self.colors
+
+    def _bit_points(self, bits):
+        """ List of the points whose bit is set in bits """
+        points = []
+        while bits:
+            low = bits & -bits
+            points.append(low.bit_length() - 1)
+            bits ^= low
+        return points
+
+    def get_color(self, point):
+        return self.colors[point]
+
+    def get_empty_points(self):
+        """
+        Return:
+            The empty points on the board
+        """
+        empty = self.on_board & ~(self.bits[BLACK] | self.bits[WHITE])
+        return np.array(self._bit_points(empty), dtype = np.int32)
+
+    def is_legal_gomoku(self, point, color):
+        """
+        Check whether it is legal for color to play on point, for the game of gomoku
+        """
+        return self.get_color(point) == EMPTY
+
+    def play_move_gomoku(self, point, color):
+        """
+        Play a move of color on point, for the game of gomoku
+        Returns boolean: whether move was legal
+        """
+        assert is_black_white(color)
+        assert point != PASS
+        if self.get_color(point) != EMPTY:
+            return False
+        self.bits[color] |= self.masks[point]
+        self.colors[point] = int(color)
+        self.empty_set.remove(point)
+        self.stone_key ^= self.zobrist.array[point][color]
+        self.sym_key ^= self.zobrist.sym_array[point][color]
+        self._update_line_codes(point, int(color))
+        self._update_winner(point, color)
+        self.current_player = GoBoardUtil.opponent(color)
+        return True
+
+    def undoMove(self, point):
+        """
+        Remove the stone on point and give the turn back to its owner
+        """
+        color = self.colors[point]
+        self.stone_key ^= self.zobrist.array[point][color]
+        self.sym_key ^= self.zobrist.sym_array[point][color]
+        self._update_line_codes(point, -color)
+        self.bits[color] &= ~self.masks[point]
+        self.colors[point] = EMPTY
+        self.empty_set.add(point)
+        self._clear_winner(point)
+        self.current_player = GoBoardUtil.opponent(self.current_player)
+
+    def _five_starts(self, bits, d):
+        """
+        Bits of the stones that start five in a row of bits in direction d.
+        """
+        pairs = bits & (bits >> d)
+        fours = pairs & (pairs >> (2 * d))
+        return fours & (bits >> (4 * d))
+
+    def point_check_game_end_gomoku(self, point):
+        """
+        Check if the point causes the game end for the game of Gomoko.
+        """
+        color = self.get_color(point)
+        if not is_black_white(color):
+            return False
+        bits = self.bits[color]
+        for d in self.directions:
+            starts = self._five_starts(bits, d)
+            if not starts:
+                continue
+            # the five contains point if it starts at most 4 steps before it
+            for k in range(5):
+                if point - k * d >= 0 and starts & self.masks[point - k * d]:
+                    return True
+        return False
+
+    def scan_game_end_gomoku(self):
+        """
+        Full-board check if the game ends for the game of Gomoku.
+        """
+        for color in (WHITE, BLACK):
+            bits = self.bits[color]
+            for d in self.directions:
+                if self._five_starts(bits, d):
+                    return True, color
+        return False, None
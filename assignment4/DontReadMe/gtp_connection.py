@@ -10,15 +10,22 @@ import traceback
 from sys import stdin, stdout, stderr
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
                        MAXSIZE, coord_to_point
+from transpositiontable import (ArrayTranspositionTable,
+                                SharedTranspositionTable)
+from solvedstore import SolvedStore, WIN, DRAW, LOSS
+import alphabeta
+import pns
+import parallel
+import lazysmp
 import numpy as np
 import re
-import signal
+from timemanager import TimeManager
 
 import sys, os
 
 class GtpConnection():
 
-    def __init__(self, go_engine, board, debug_mode = False):
+    def __init__(self, go_engine, board, debug_mode = False, store_path = None):
         """
         Manage a GTP connection for a Go-playing engine
 
@@ -28,11 +35,18 @@ class GtpConnection():
             a program that can reply to a set of GTP commandsbelow
         board: 
             Represents the current board state.
+        store_path:
+            file of the solved position store to open, if any.
         """
         self._debug_mode = debug_mode
         self.go_engine = go_engine
         self.board = board
-        signal.signal(signal.SIGALRM, self.handler)
+        self.tt = ArrayTranspositionTable()
+        # the module that solve uses, selected with the solver command
+        self.solver = alphabeta
+        self.store = None
+        if store_path is not None:
+            self.store = SolvedStore(store_path)
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -58,7 +72,9 @@ class GtpConnection():
             "solve": self.solve_cmd,
             "list_solve_point": self.list_solve_point_cmd, # below is added for Gomoku3
             "policy": self.set_playout_policy, 
-            "policy_moves": self.display_pattern_moves
+            "policy_moves": self.display_pattern_moves,
+            "solved_store": self.solved_store_cmd,
+            "solver": self.solver_cmd
         }
         self.timelimit=60
 
@@ -72,7 +88,9 @@ class GtpConnection():
             "genmove": (1, 'Usage: genmove {w,b}'),
             "play": (2, 'Usage: play {b,w} MOVE'),
             "legal_moves": (1, 'Usage: legal_moves {w,b}'),
-            "policy":(1, 'Usage: set playout policy {random, rule_based}')
+            "policy":(1, 'Usage: set playout policy {random, rule_based}'),
+            "solved_store": (1, 'Usage: solved_store FILE'),
+            "solver": (1, 'Usage: solver {alphabeta, pns, parallel, lazysmp}')
         }
     
     def set_playout_policy(self, args):
@@ -189,6 +207,8 @@ class GtpConnection():
 
     def quit_cmd(self, args):
         """ Quit game and exit the GTP interface """
+        if self.store is not None:
+            self.store.flush()
         self.respond()
         exit()
 
@@ -209,7 +229,10 @@ class GtpConnection():
         """
         Reset the game with new boardsize args[0]
         """
-        self.reset(int(args[0]))
+        size = int(args[0])
+        if size != self.board.size:
+            self.tt.clear()
+        self.reset(size)
         self.respond()
 
     def showboard_cmd(self, args):
@@ -286,26 +309,99 @@ class GtpConnection():
         self.timelimit = args[0]
         self.respond('')
 
-    def handler(self, signum, fram):
-        self.board = self.sboard
-        raise Exception("unknown")
+    def solved_store_cmd(self, args):
+        """
+        Open the solved position store in file args[0], creating it if needed.
+        Solved positions are then saved to it and looked up in it.
+        """
+        try:
+            store = SolvedStore(args[0])
+        except Exception as e:
+            self.error('{}'.format(str(e)))
+            return
+        if self.store is not None:
+            self.store.flush()
+        self.store = store
+        self.respond()
+
+    def solver_cmd(self, args):
+        """
+        Select the search used by solve: alphabeta, pns, parallel or
+        lazysmp. lazysmp gets a table in shared memory, which its workers
+        search with, the others a table of this process.
+        """
+        solvers = {'alphabeta': alphabeta, 'pns': pns, 'parallel': parallel,
+                   'lazysmp': lazysmp}
+        if args[0] not in solvers:
+            self.error('Usage: solver {alphabeta, pns, parallel, lazysmp}')
+            return
+        self.solver = solvers[args[0]]
+        shared = isinstance(self.tt, SharedTranspositionTable)
+        if shared != (self.solver is lazysmp):
+            if shared:
+                self.tt = ArrayTranspositionTable()
+            else:
+                self.tt = SharedTranspositionTable()
+        self.respond()
+
+    def _lookup_solved(self):
+        """
+        (result, move) of the current position from the solved position
+        store, or None. Symmetric positions share one record, so the move
+        is mapped back from the stored symmetry.
+        """
+        code, sym = self.board.canonical_code()
+        entry = self.store.lookup(code)
+        if entry is None:
+            return None
+        result, move = entry
+        if move is not None:
+            move = self.board.geometry.inverse_symmetries[sym][move]
+        return result, move
+
+    def _store_solved(self, result, move):
+        """ Record result and move of the current position in the store """
+        code, sym = self.board.canonical_code()
+        if move is not None:
+            move = self.board.geometry.symmetries[sym][move]
+        self.store.store(code, result, move)
+
+    def solve_board(self, timer):
+        """
+        Solve the current position like SimpleGoBoard.solve until timer
+        expires, answering from the solved position store if it is open
+        and has the position.
+        """
+        toplay = 'b' if self.board.current_player == BLACK else 'w'
+        if self.store is not None:
+            entry = self._lookup_solved()
+            if entry is not None:
+                result, move = entry
+                if result == WIN:
+                    return toplay, move
+                if result == DRAW:
+                    return 'draw', move
+                return ('w' if toplay == 'b' else 'b'), "NoMove"
+        winner, move = self.board.solve(self.tt, self.solver, timer)
+        if self.store is not None and winner != 'unknown':
+            if winner == toplay:
+                self._store_solved(WIN, move)
+            elif winner == 'draw':
+                self._store_solved(DRAW, move)
+            else:
+                self._store_solved(LOSS, None)
+        return winner, move
 
     def solve_cmd(self, args):
-        try:
-            self.sboard = self.board.copy()
-            signal.alarm(int(self.timelimit)-1)
-            winner,move = self.board.solve()
-            self.board = self.sboard
-            signal.alarm(0)
-            if move != "NoMove":
-                if move == None:
-                    self.respond('{} {}'.format(winner, self.board._point_to_coord(move)))
-                    return 
-                self.respond('{} {}'.format(winner, format_point(point_to_coord(move, self.board.size))))
+        timer = TimeManager.for_command(float(self.timelimit))
+        winner,move = self.solve_board(timer)
+        if move != "NoMove":
+            if move == None:
+                self.respond('{} {}'.format(winner, self.board._point_to_coord(move)))
                 return 
-            self.respond('{}'.format(winner))
-        except Exception as e:
-            self.respond('{}'.format(str(e)))
+            self.respond('{} {}'.format(winner, format_point(point_to_coord(move, self.board.size))))
+            return 
+        self.respond('{}'.format(winner))
 
     def genmove_cmd(self, args):
         """
@@ -327,9 +423,15 @@ class GtpConnection():
             return
         move=None
         
-        self.sboard = self.board.copy()
-        move = self.go_engine.get_move(self.board, color)
-        self.board=self.sboard
+        # a position already solved as a win is answered from the store
+        if self.store is not None:
+            entry = self._lookup_solved()
+            if entry is not None and entry[0] == WIN \
+               and self.board.current_player == color:
+                move = entry[1]
+        if move is None:
+            timer = TimeManager.for_command(float(self.timelimit))
+            move = self.go_engine.get_move(self.board, color, timer)
 
         if move == PASS:
             self.respond("pass")
@@ -0,0 +1,78 @@
+"""
+lazysmp.py
+
+Lazy SMP: several worker processes search the same root at the same
+time, sharing one SharedTranspositionTable. Every worker but the first
+orders equal moves a little differently, so the workers spread over
+different parts of the tree and mostly find the results of the others
+in the table instead of searching them again. The first worker to
+finish gives the answer and the others are stopped.
+
+Every worker stops at the deadline of the caller's timer by itself, and
+the main process stops waiting for an answer then and terminates them.
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+
+import alphabeta
+from moveorder import MoveOrderer
+from transpositiontable import SharedTranspositionTable, MAX_WORKERS
+from timemanager import TimeManager, NO_DEADLINE
+
+
+def _search(board, name, worker, deadline, results):
+    """
+    Worker process: solve board with the shared table called name, and
+    put the result of alphabeta.solve in results if it finishes before
+    the perf_counter deadline.
+    """
+    # slot 0 of the table belongs to the process that made it
+    tt = SharedTranspositionTable(name=name, worker=worker + 1)
+    timer = TimeManager.until(deadline)
+    orderer = MoveOrderer(board.maxpoint)
+    # the root moves are shuffled, so every worker needs its own seed
+    random.seed(worker)
+    if worker > 0:
+        orderer.perturb(random.Random(worker))
+    result = alphabeta.solve(board, tt, orderer, timer)
+    if not timer.stopped:
+        results.put(result)
+
+
+def solve(board, tt, timer=NO_DEADLINE, processes=None):
+    """
+    Solve board like alphabeta.solve with processes workers, one per CPU
+    by default. The workers share tt if it is a SharedTranspositionTable,
+    and a new one otherwise.
+    The result means nothing if timer expires.
+    """
+    result = alphabeta.game_end(board)
+    if result != None:
+        return result, "First", None
+    shared = tt
+    if not isinstance(tt, SharedTranspositionTable):
+        shared = SharedTranspositionTable()
+    processes = min(processes or os.cpu_count() or 1, MAX_WORKERS - 1)
+    results = multiprocessing.Queue()
+    # worker 0 searches in plain move order, the others perturb it
+    workers = [multiprocessing.Process(
+                   target=_search,
+                   args=(board, shared.name, worker, timer.deadline,
+                         results),
+                   daemon=True)
+               for worker in range(processes)]
+    try:
+        for worker in workers:
+            worker.start()
+        return results.get(timeout=timer.remaining())
+    except queue.Empty:
+        timer.stop()
+        return False, "NoMove", None
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,224 @@
+"""
+linepatterns.py
+
+Lookup tables of the patterns on a line of the board.
+
+The stones on a line of points (a row, column or diagonal) are encoded
+as one base-3 integer, the sum of color(line[k]) * 3**k with EMPTY,
+BLACK and WHITE being 0, 1 and 2. The board keeps the code of every line
+up to date as stones are placed and removed, see SimpleGoBoard.line_codes.
+Everything the players ask about a line only depends on its
+length and code, so it is worked out once per (length, code) and looked
+up in a table afterwards.
+"""
+
+from board_util import EMPTY, BLACK, WHITE, GoBoardUtil
+
+# the kinds of points of a LinePattern, indices into LinePattern.offsets
+WINS = 0
+OPEN_FOURS = 1
+BLOCK_OPEN_FOURS = 2
+NUM_KINDS = 3
+
+# one table per line length, code -> LinePattern
+_tables = {}
+
+
+class LinePattern(object):
+    """
+    The points of interest of a line with given colors, as offsets into
+    the line, indexed by the color of the player they are for.
+    Offsets are in the order the lines used to be scanned in, without
+    repeats. offsets holds the three of them, indexed by kind.
+    has_five and has_open_four tell whether the line holds five in a row
+    and an open four .xxxx. of each color.
+    """
+    __slots__ = ("wins", "open_fours", "block_open_fours", "offsets",
+                 "empty",
+                 "has_five", "has_open_four")
+
+    def __init__(self, colors):
+        self.wins = [()] * 3
+        self.open_fours = [()] * 3
+        self.block_open_fours = [()] * 3
+        self.has_five = [False] * 3
+        self.has_open_four = [False] * 3
+        for player in (BLACK, WHITE):
+            self.has_five[player] = _has_run(colors, player, 5, 0)
+            self.has_open_four[player] = _has_run(colors, player, 4, 1)
+            self.wins[player] = _win_offsets(colors, player)
+            self.open_fours[player] = _open_four_offsets(colors, player)
+            self.block_open_fours[player] = _block_open_four_offsets(colors,
+                                                                     player)
+        self.offsets = (self.wins, self.open_fours, self.block_open_fours)
+        self.empty = not any(any(kind) for kind in self.offsets)
+
+
+def line_pattern(length, code):
+    """ The LinePattern of a line of length points with code """
+    table = _tables.get(length)
+    if table is None:
+        table = _tables[length] = {}
+    pattern = table.get(code)
+    if pattern is None:
+        colors = []
+        rest = code
+        for _ in range(length):
+            colors.append(rest % 3)
+            rest //= 3
+        pattern = table[code] = LinePattern(colors)
+    return pattern
+
+
+class ThreatTracker(object):
+    """
+    The points of interest of all lines of a board, kept up to date by
+    update whenever the code of a line changes, so that they never have
+    to be looked for on the whole board.
+    For each kind and color, lines holds the indices of the lines with
+    such points, and points counts for each point how many lines give it.
+    """
+    def __init__(self, lines):
+        """ The threats of an empty board with the given lines """
+        self.all_lines = lines
+        self.patterns = [line_pattern(len(line), 0) for line in lines]
+        self.lines = [[set() for _ in range(3)] for _ in range(NUM_KINDS)]
+        self.points = [[{} for _ in range(3)] for _ in range(NUM_KINDS)]
+
+    def copy(self):
+        t = ThreatTracker.__new__(ThreatTracker)
+        t.all_lines = self.all_lines
+        t.patterns = list(self.patterns)
+        t.lines = [[set(lines) for lines in kind] for kind in self.lines]
+        t.points = [[dict(points) for points in kind]
+                    for kind in self.points]
+        return t
+
+    def update(self, index, code):
+        """ Line index now has the given code """
+        line = self.all_lines[index]
+        old = self.patterns[index]
+        new = line_pattern(len(line), code)
+        self.patterns[index] = new
+        if old.empty and new.empty:
+            return
+        for kind in range(NUM_KINDS):
+            for color in (BLACK, WHITE):
+                before = old.offsets[kind][color]
+                after = new.offsets[kind][color]
+                if before == after:
+                    continue
+                points = self.points[kind][color]
+                for offset in before:
+                    point = line[offset]
+                    if points[point] == 1:
+                        del points[point]
+                    else:
+                        points[point] -= 1
+                for offset in after:
+                    point = line[offset]
+                    points[point] = points.get(point, 0) + 1
+                if after:
+                    self.lines[kind][color].add(index)
+                else:
+                    self.lines[kind][color].discard(index)
+
+    def moves(self, kind, color):
+        """
+        The points of given kind for color, in line order and without
+        repeats, the order of a scan of all lines.
+        """
+        moves = []
+        for index in sorted(self.lines[kind][color]):
+            line = self.all_lines[index]
+            for offset in self.patterns[index].offsets[kind][color]:
+                move = line[offset]
+                if move not in moves:
+                    moves.append(move)
+        return moves
+
+
+def _add(offsets, offset):
+    if offset not in offsets:
+        offsets.append(offset)
+
+
+def _has_run(colors, player, length, ends):
+    """
+    Whether colors holds length stones of player in a row, with ends
+    empty points on both sides.
+    """
+    for i in range(len(colors) - length - 2 * ends + 1):
+        if ends and (colors[i] != EMPTY or colors[i + length + 1] != EMPTY):
+            continue
+        if all(colors[k] == player for k in range(i + ends, i + ends + length)):
+            return True
+    return False
+
+
+def _single_empty(colors, start, end, player):
+    """
+    The offset of the only empty point of colors[start:end] if all the
+    others are stones of player, else -1.
+    """
+    empty = -1
+    for k in range(start, end):
+        if colors[k] == EMPTY:
+            if empty != -1:
+                return -1
+            empty = k
+        elif colors[k] != player:
+            return -1
+    return empty
+
+
+def _win_offsets(colors, player):
+    """ Points where player makes five: xxxx., xx.xx, ... """
+    offsets = []
+    for i in range(len(colors) - 4):
+        empty = _single_empty(colors, i, i + 5, player)
+        if empty != -1:
+            _add(offsets, empty)
+    return tuple(offsets)
+
+
+def _open_four_offsets(colors, player):
+    """ Points where player makes an open four .xxxx. """
+    offsets = []
+    for i in range(len(colors) - 5):
+        if colors[i] != EMPTY or colors[i + 5] != EMPTY:
+            continue
+        empty = _single_empty(colors, i + 1, i + 5, player)
+        if empty != -1:
+            _add(offsets, empty)
+    return tuple(offsets)
+
+
+def _block_open_four_offsets(colors, player):
+    """
+    Points where player stops an open four of the opponent: its open four
+    points, and next to a border also the ends of the six points.
+    """
+    opponent = GoBoardUtil.opponent(player)
+    last = len(colors) - 6
+    offsets = []
+    for i in range(len(colors) - 5):
+        if colors[i] != EMPTY or colors[i + 5] != EMPTY:
+            continue
+        empty = _single_empty(colors, i + 1, i + 5, opponent)
+        if empty == -1:
+            continue
+        moves = [empty]
+        if i == 0:
+            # e.g. for |.XX.X., blocking moves can be 0, 3, 5, | is the border
+            moves.append(5)
+            if empty != 1:
+                moves.append(0)
+        elif i == last:
+            # e.g. for .XX.X.|, blocking moves can be 0, 3, 5
+            moves.append(i)
+            if empty != i + 4:
+                moves.append(i + 5)
+        for move in moves:
+            _add(offsets, move)
+    return tuple(offsets)
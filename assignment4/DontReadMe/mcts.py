@@ -1,13 +1,13 @@
 from typing import List, Tuple
 import random
-import signal
 
 from board_util import GoBoardUtil, EMPTY, BORDER
 from simple_board import SimpleGoBoard
+from linepatterns import LinePattern, line_pattern, WINS, OPEN_FOURS
+from timemanager import NO_DEADLINE
 
 # configs
 NUM_SIMULATION = 1000
-SIMULATION_TIME_LIMIT = 50 # seconds
 
 
 class NodeData:
@@ -22,36 +22,33 @@ class MCTSEngine:
     def __init__(self):
         """
         self.table: dict
-            key: hashKey: int
+            key: hashKey: int, the canonical Zobrist code of the board,
+                 shared by its 8 symmetric positions
             value: List[NodeData] (len 3, index: BLACK or WHITE)
         """
         self.table = dict()
         self.numSimulation = NUM_SIMULATION
-        self.initLines()
 
 
-    def getMove(self, board: SimpleGoBoard) -> int:
+    def getMove(self, board: SimpleGoBoard, timer=NO_DEADLINE) -> int:
+        """
+        The best move after numSimulation simulations, or after the ones
+        that finished before timer expired.
+        """
         # it is garenteed that there is at least one possible move
         legal_moves = GoBoardUtil.generate_legal_moves_gomoku(board)
         if len(legal_moves) == 49:  # empty board
             return 36 # D4, the center
-        
-        try:
-            signal.alarm(SIMULATION_TIME_LIMIT)
-            bestMove = self.runSimulation(board)
-            signal.alarm(0)
-        except:
-            bestMove = self.getBestMove(board, legal_moves)
-        return bestMove
+        return self.runSimulation(board, timer)
 
     def getBestMove(self, board: SimpleGoBoard, moves: List[int]) -> int:
         highest = 0
         bestMove = 0
         toplay = board.current_player
         for move in moves:
-            board.board[move] = toplay
-            hashKey = hash(board)
-            board.board[move] = EMPTY
+            board.play_move_gomoku(move, toplay)
+            hashKey, _ = board.canonical_code()
+            board.undoMove(move)
             if hashKey not in self.table:
                 continue
             data = self.table[hashKey][toplay]
@@ -82,7 +79,7 @@ class MCTSEngine:
         return data
 
     
-    def runSimulation(self, board: SimpleGoBoard) -> None:
+    def runSimulation(self, board: SimpleGoBoard, timer=NO_DEADLINE) -> int:
         toplay = board.current_player
         firstMoves, winner = self.computeMoves(board, toplay)
         if winner != -1:
@@ -91,11 +88,14 @@ class MCTSEngine:
             return firstMoves[0]
         
         for i in range(self.numSimulation):
-            boardCopy = board.copy()
+            mark = board.mark()
             firstMove = random.choice(firstMoves)
-            boardCopy.play_move_gomoku(firstMove, boardCopy.current_player)
-            hashKey = hash(boardCopy)
-            winner = self.simulate(boardCopy)
+            board.push(firstMove)
+            hashKey, _ = board.canonical_code()
+            winner = self.simulate(board, timer)
+            board.pop_to(mark)
+            if timer.stopped:
+                break
             data = self.getNodeData(hashKey, toplay)
             data.numVisited += 1
             if winner == toplay:
@@ -103,14 +103,24 @@ class MCTSEngine:
         return self.getBestMove(board, firstMoves)
 
 
-    def simulate(self, board: SimpleGoBoard) -> int:
+    def simulate(self, board: SimpleGoBoard, timer=NO_DEADLINE) -> int:
+        """
+        Play a game to the end and return its winner, or None if timer
+        expires first.
+        """
         while True:
-            hashKey = hash(board)
+            if timer.expired():
+                return None
+            hashKey, sym = board.canonical_code()
             toplay = board.current_player
             if hashKey not in self.table:
                 self.table[hashKey] = [None, None, None]
             if self.table[hashKey][toplay] == None:
                 moves, winner = self.computeMoves(board, toplay)
+                # kept as moves of the canonical position
+                if moves is not None:
+                    perm = board.geometry.symmetries[sym]
+                    moves = [perm[move] for move in moves]
                 data = NodeData(winner, moves)
                 self.table[hashKey][toplay] = data
 
@@ -118,8 +128,7 @@ class MCTSEngine:
             if data.winner == -1:   # not win yet
                 # randomly make a move
                 move = random.choice(data.moves)
-                board.board[move] = toplay
-                board.current_player = GoBoardUtil.opponent(toplay)
+                board.push(board.geometry.inverse_symmetries[sym][move])
             else:   # winner can be determined
                 data.numVisited += 1
                 if toplay == data.winner:
@@ -136,133 +145,59 @@ class MCTSEngine:
             return None, winner
         
         opponent = GoBoardUtil.opponent(toplay)
+        points = board.threats.points
+        if not points[WINS][toplay] and not points[WINS][opponent]:
+            # no five can be made and no open four is on the board, so the
+            # only moves that count are those making an open four, which
+            # are known without playing them
+            open_fours = points[OPEN_FOURS][toplay]
+            if open_fours:
+                newMoves = [move for move in legal_moves if move in open_fours]
+                if newMoves:
+                    return newMoves, toplay
+            return legal_moves, -1
+
+        all_lines = board.geometry.lines
         newMoves = []
         for move in legal_moves:
-            board.board[move] = toplay
-            lines = self.getCorrespondingLines(board, move)
+            board.play_move_gomoku(move, toplay)
+            # the patterns of the rows, cols and diags through move that can
+            # hold five in a row, looked up by the codes of their stones
+            codes = board.line_codes
+            lines = [line_pattern(len(all_lines[index]), codes[index])
+                     for index, _ in board.geometry.line_powers[move]]
             if self.computeMovesCanWin(board, toplay, lines):    # can win
+                board.undoMove(move)
                 return [move], toplay
             if self.computeMovesCanWin(board, opponent, lines):  # block win
+                board.undoMove(move)
                 return [move], -1
             if self.computeMovesHasOpenFour(board, toplay, lines):
                 newMoves.append(move)
             if self.computeMovesHasOpenFour(board, opponent, lines): # block open four
+                board.undoMove(move)
                 return [move], -1
-            board.board[move] = EMPTY
+            board.undoMove(move)
 
         if len(newMoves) != 0:
             return newMoves, toplay
         return legal_moves, -1
 
 
-    def computeMovesCanWin(self, board: SimpleGoBoard, toplay: int, lines: List[int]) -> bool:
-        for line in lines:
-            for i in range(len(line) - 4):
-                count = 0
-                for j in range(i, i + 5):
-                    pos = line[j]
-                    if board.board[pos] == toplay:
-                        count += 1
-                if count == 5:
-                    return True
+    def computeMovesCanWin(self, board: SimpleGoBoard, toplay: int, lines: List[LinePattern]) -> bool:
+        for pattern in lines:
+            if pattern.has_five[toplay]:
+                return True
         return False
 
 
-    def computeMovesHasOpenFour(self, board: SimpleGoBoard, toplay: int, lines: List[int]) -> bool:
-        for line in lines:
-            for i in range(len(line) - 5):
-                if board.board[line[i]] != EMPTY or board.board[line[i + 5]] != EMPTY:
-                    continue
-                count = 0
-                for j in range(i + 1, i + 5):
-                    pos = line[j]
-                    if board.board[pos] == toplay:
-                        count += 1
-                if count == 4:
-                    return True
+    def computeMovesHasOpenFour(self, board: SimpleGoBoard, toplay: int, lines: List[LinePattern]) -> bool:
+        for pattern in lines:
+            if pattern.has_open_four[toplay]:
+                return True
         return False
 
 
-    def initLines(self):
-        self.rows = [
-            [ 9, 10, 11, 12, 13, 14, 15], 
-            [17, 18, 19, 20, 21, 22, 23], 
-            [25, 26, 27, 28, 29, 30, 31], 
-            [33, 34, 35, 36, 37, 38, 39], 
-            [41, 42, 43, 44, 45, 46, 47], 
-            [49, 50, 51, 52, 53, 54, 55], 
-            [57, 58, 59, 60, 61, 62, 63]
-        ]
-        self.cols = [
-            [ 9, 17, 25, 33, 41, 49, 57], 
-            [10, 18, 26, 34, 42, 50, 58], 
-            [11, 19, 27, 35, 43, 51, 59], 
-            [12, 20, 28, 36, 44, 52, 60], 
-            [13, 21, 29, 37, 45, 53, 61], 
-            [14, 22, 30, 38, 46, 54, 62], 
-            [15, 23, 31, 39, 47, 55, 63]
-        ]
-        self.diags1 = [ 
-            [ 9, 18, 27, 36, 45, 54, 63],
-            [10, 19, 28, 37, 46, 55], 
-            [11, 20, 29, 38, 47], 
-            [12, 21, 30, 39], 
-            [13, 22, 31], 
-            [14, 23], 
-            [15],
-            [17, 26, 35, 44, 53, 62], 
-            [25, 34, 43, 52, 61], 
-            [33, 42, 51, 60], 
-            [41, 50, 59], 
-            [49, 58], 
-            [57]
-        ]
-        self.diags2 = [
-            [9],
-            [10, 17],
-            [11, 18, 25],
-            [12, 19, 26, 33],
-            [13, 20, 27, 34, 41],
-            [14, 21, 28, 35, 42, 49],
-            [15, 22, 29, 36, 43, 50, 57], 
-            [23, 30, 37, 44, 51, 58], 
-            [31, 38, 45, 52, 59], 
-            [39, 46, 53, 60], 
-            [47, 54, 61], 
-            [55, 62], 
-            [63]  
-        ]
-        self.lines = []
-        for row in self.rows:
-            self.lines.append(row)
-        for col in self.cols:
-            self.lines.append(col)
-        self.diag1Dict = {}
-        for i in range(len(self.diags1)):
-            diag = self.diags1[i]
-            self.lines.append(diag)
-            for p in diag:
-                self.diag1Dict[p] = i
-        self.diag2Dict = {}
-        for i in range(len(self.diags2)):
-            diag = self.diags2[i]
-            self.lines.append(diag)
-            for p in diag:
-                self.diag2Dict[p] = i
-
-
-    def getCorrespondingLines(self, board: SimpleGoBoard, pos: int) -> List[List[int]]:
-        """
-        Returns the *positions* of the horizontal, vertical, and diagonal lines where pos is located.
-        """
-        row = self.rows[pos // 8 - 1]
-        col = self.cols[pos % 8 - 1]
-        diag1 = self.diags1[self.diag1Dict[pos]]
-        diag2 = self.diags2[self.diag2Dict[pos]]
-        lines = [row, col, diag1, diag2]
-        return lines
-
-
     def filterMoves(self, board: SimpleGoBoard, legal_moves: List[int], color: int) -> Tuple[int, List[int]]:
         """
         Check if the game can be determined
@@ -0,0 +1,76 @@
+"""
+moveorder.py
+
+Move ordering for the alpha-beta searches, without searching any move:
+1. the best move stored in the transposition table
+2. all other moves by their static gain, a cheap score of the move
+   given by the caller, if any
+3. among moves of equal gain, the killer moves of the ply, the last two
+   moves that caused a cutoff at that distance from the root
+4. then the other moves by their history score, which grows every time
+   a move of that color on that point causes a cutoff
+Ties keep the order the moves were given in.
+"""
+
+TT_MOVE_PRIORITY = 2
+KILLER_PRIORITY = 1
+NUM_KILLERS = 2
+# history scores a perturbed ordering starts with are below this
+PERTURBATION = 4
+
+
+class MoveOrderer(object):
+    def __init__(self, maxpoint):
+        """
+        Empty tables for the points of a board with given maxpoint.
+        One ordering is meant to be shared by all iterations of a search.
+        """
+        self.maxpoint = maxpoint
+        self.clear()
+
+    def clear(self):
+        # a search never goes deeper than one ply per point
+        self.killers = [[None] * NUM_KILLERS
+                        for _ in range(self.maxpoint + 1)]
+        # indexed by color, then point
+        self.history = [[0] * self.maxpoint for _ in range(3)]
+
+    def perturb(self, rng):
+        """
+        Start the history scores at small random values from rng, so that
+        searches with different rng order otherwise equal moves
+        differently. Used by the Lazy SMP workers.
+        """
+        for history in self.history:
+            for move in range(self.maxpoint):
+                history[move] = rng.randrange(PERTURBATION)
+
+    def order(self, moves, ply, color, tt_move=None, gain=None):
+        """
+        Return moves of color at ply sorted best first.
+        gain(move, color), if given, is a cheap static score of a move
+        that ranks below the TT move but above killers and history.
+        """
+        killers = self.killers[ply]
+        history = self.history[color]
+
+        def priority(move):
+            if move == tt_move:
+                return (TT_MOVE_PRIORITY, 0, 0, 0)
+            static = 0 if gain is None else gain(move, color)
+            if move in killers:
+                return (0, static, KILLER_PRIORITY, 0)
+            return (0, static, 0, history[move])
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def cutoff(self, move, ply, color, depth):
+        """
+        Record that move of color at ply caused a beta cutoff in a search
+        with depth plies left. Deeper searches count more.
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[color][move] += depth * depth
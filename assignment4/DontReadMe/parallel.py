@@ -0,0 +1,116 @@
+"""
+parallel.py
+
+Root-parallel alpha-beta: the moves of the root are split over a pool of
+worker processes, which get around the GIL that keeps threads from
+sharing Python search work.
+
+Every worker holds its own copy of the root board and its own
+transposition table, kept for all the root moves it is given. A win
+ends the search and stops the other workers as soon as all root moves
+before it in move order are back.
+
+Results are merged in root move order: the result of the root is the
+best result of its moves, and the move is the first root move in move
+order with that result. Neither depends on the order the workers finish
+in.
+
+Every worker stops at the deadline of the caller's timer by itself, and
+the main process stops waiting for results then and terminates the pool.
+"""
+
+import multiprocessing
+import os
+
+from board_util import GoBoardUtil
+from alphabeta import alphabeta, game_end
+from moveorder import MoveOrderer
+from threatsearch import find_threat_win
+from transpositiontable import ArrayTranspositionTable
+from timemanager import TimeManager, NO_DEADLINE
+
+# memory of the transposition table of each worker
+WORKER_TT_BYTES = 16 * 1024 * 1024
+
+# state of a worker process, set up once by _init_worker
+_board = None
+_tt = None
+_orderer = None
+_timer = None
+
+
+def _init_worker(board, deadline):
+    global _board, _tt, _orderer, _timer
+    _board = board
+    _tt = ArrayTranspositionTable(WORKER_TT_BYTES)
+    _orderer = MoveOrderer(board.maxpoint)
+    _timer = TimeManager.until(deadline)
+
+
+def _search_move(task):
+    """
+    Worker: the result of root move task = (index, move) for the player
+    to move at the root, 1, 0 or -1, or None if time ran out.
+    """
+    index, move = task
+    _board.push(move)
+    result = -alphabeta(_board, -1, 1, _tt, _orderer, 1, _timer)
+    _board.pop()
+    if _timer.stopped:
+        return index, None
+    return index, result
+
+
+def _first_win(values, is_win):
+    """
+    Index of the first root move in move order that wins, once every
+    earlier move has come back, else None.
+    """
+    for index, value in enumerate(values):
+        if value is None:
+            return None
+        if is_win(value):
+            return index
+    return None
+
+
+def solve(board, tt, timer=NO_DEADLINE, processes=None):
+    """
+    Solve board like alphabeta.solve with processes workers, one per CPU
+    by default. tt is not shared with the workers.
+    The result means nothing if timer expires.
+    """
+    result = game_end(board)
+    if result != None:
+        return result, "First", None
+    move = find_threat_win(board, timer)
+    if move is not None:
+        return True, move, None
+    solvePoint = board.list_solve_point()
+    if solvePoint:
+        moves = [solvePoint[0]]
+    else:
+        # sorted, so that the merge does not depend on the shuffle
+        moves = sorted(GoBoardUtil.generate_legal_moves_gomoku(board))
+    results = [None] * len(moves)
+    processes = min(processes or os.cpu_count() or 1, len(moves))
+    with multiprocessing.Pool(processes, _init_worker,
+                              (board, timer.deadline)) as pool:
+        # leaving the with block terminates the workers that still run
+        searches = pool.imap_unordered(_search_move, enumerate(moves))
+        for _ in moves:
+            try:
+                index, result = searches.next(timer.remaining())
+            except multiprocessing.TimeoutError:
+                result = None
+            if result is None:
+                timer.stop()
+                return False, "NoMove", None
+            results[index] = result
+            if _first_win(results, lambda r: r == 1) is not None:
+                break
+    if 1 in results:
+        return True, moves[results.index(1)], None
+    if 0 in results:
+        return True, "NoMove", moves[results.index(0)]
+    return False, "NoMove", None
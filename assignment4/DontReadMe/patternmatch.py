@@ -0,0 +1,121 @@
+"""
+patternmatch.py
+
+Aho-Corasick automata for the move patterns of SimpleGoBoard.
+
+A pattern is a string over '.' (empty), 'x' (a stone of the player the
+patterns are for), 'o' (a stone of the opponent) and 'B' (border), mapped
+to a set of distances back from its last character to the points it
+suggests. All patterns of a pattern list are compiled, for one color,
+into a single automaton over the board colors, so one pass along every
+line of the board finds every match at once. The automaton is a full
+transition table: each step is one list lookup, with no failure links
+left to follow.
+
+The lines are scanned along geometry.scan_sequence, the chains of points
+in the four directions the patterns are read in, separated by maxpoint.
+"""
+
+from collections import deque
+
+from board_util import GoBoardUtil, EMPTY, BORDER
+
+# the color of the separator between the chains of scan_sequence
+SEPARATOR = 4
+NUM_SYMBOLS = 5
+
+_automata = {}
+
+
+def get_automaton(name, pattern_list, color):
+    """
+    The PatternAutomaton of pattern_list for color, compiled once per
+    name and color.
+    """
+    key = (name, color)
+    if key not in _automata:
+        _automata[key] = PatternAutomaton(pattern_list, color)
+    return _automata[key]
+
+
+class PatternAutomaton(object):
+    def __init__(self, pattern_list, color):
+        """
+        Compile pattern_list, a list of {pattern: distances} dicts, one per
+        category, with 'x' standing for color.
+        """
+        symbols = {'.': EMPTY, 'x': color,
+                   'o': GoBoardUtil.opponent(color), 'B': BORDER}
+        # the trie of all patterns; outputs[state] holds
+        # (length, category, distances) of the patterns ending there
+        goto = [[None] * NUM_SYMBOLS]
+        outputs = [[]]
+        for category, patterns in enumerate(pattern_list):
+            for pattern, distances in patterns.items():
+                state = 0
+                for char in pattern:
+                    symbol = symbols[char]
+                    if goto[state][symbol] is None:
+                        goto[state][symbol] = len(goto)
+                        goto.append([None] * NUM_SYMBOLS)
+                        outputs.append([])
+                    state = goto[state][symbol]
+                outputs[state].append((len(pattern), category,
+                                       tuple(distances)))
+        # breadth first, fill in the missing transitions from the longest
+        # proper suffix that is a trie state, and inherit its outputs
+        fail = [0] * len(goto)
+        queue = deque()
+        for symbol in range(NUM_SYMBOLS):
+            child = goto[0][symbol]
+            if child is None:
+                goto[0][symbol] = 0
+            else:
+                queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for symbol in range(NUM_SYMBOLS):
+                child = goto[state][symbol]
+                if child is None:
+                    goto[state][symbol] = goto[fail[state]][symbol]
+                else:
+                    fail[child] = goto[fail[state]][symbol]
+                    outputs[child] = outputs[child] + outputs[fail[child]]
+                    queue.append(child)
+        # states are numbered by their offset in the flat table
+        self.delta = [NUM_SYMBOLS * goto[state][symbol]
+                      for state in range(len(goto))
+                      for symbol in range(NUM_SYMBOLS)]
+        self.outputs = {NUM_SYMBOLS * state: tuple(found)
+                        for state, found in enumerate(outputs) if found}
+        self.num_categories = len(pattern_list)
+
+    def move_sets(self, colors, geometry):
+        """
+        One set of suggested points per category for the board with
+        colors, a list indexed by point.
+        Points are added in the order of (start point, direction, length)
+        of the matches, which is the order the recursive scan that came
+        before the automaton found them in, so that the sets iterate in
+        the same order too.
+        """
+        colors = colors + [SEPARATOR]
+        delta = self.delta
+        outputs = self.outputs
+        sequence = geometry.scan_sequence
+        directions = geometry.scan_directions
+        matches = []
+        state = 0
+        for k, point in enumerate(sequence):
+            state = delta[state + colors[point]]
+            if state in outputs:
+                for length, category, distances in outputs[state]:
+                    start = k - length + 1
+                    matches.append((sequence[start], directions[start],
+                                    length, k, category, distances))
+        matches.sort()
+        moveSet = [set() for _ in range(self.num_categories)]
+        for _, _, _, k, category, distances in matches:
+            for distance in distances:
+                moveSet[category].add(sequence[k - distance])
+        return moveSet
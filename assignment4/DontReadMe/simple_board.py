@@ -12,12 +12,49 @@ The board uses a 1-dimensional representation with padding
 import numpy as np
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, \
                        PASS, is_black_white, coord_to_point, where1d, \
-                       MAXSIZE, NULLPOINT
+                       MAXSIZE, NULLPOINT, PointSet
+from geometry import get_geometry
+from linepatterns import ThreatTracker, WINS, OPEN_FOURS
+from zobrist import get_zobrist_hash
 import alphabeta
+from timemanager import NO_DEADLINE
+from patternmatch import get_automaton
+
+# {pattern: distances} for the player to move, x, and the opponent, o, see
+# patternmatch.py; distances count back from the last point of a pattern
+PATTERN_MOVES = [
+    {'xxxx.':{0},'xxx.x':{1},'xx.xx':{2},'x.xxx':{3},'.xxxx':{4}}, #win
+    {'oooo.':{0},'ooo.o':{1},'oo.oo':{2},'o.ooo':{3},'.oooo':{4}}, #block win
+    {'.xxx..':{1},'..xxx.':{4},'.xx.x.':{2},'.x.xx.':{3}}, #make-four
+    {'.ooo..':{1,5},'..ooo.':{0,4},'.oo.o.':{0,2,5},'.o.oo.':{0,3,5}, 'B.ooo..':{0}, '..ooo.B':{6},
+     'x.ooo..':{0}, '..ooo.x':{6} #block-open-four
+     }]
+SOLVE_POINTS = [
+    {'xxxx.':{0},'xxx.x':{1},'xx.xx':{2},'x.xxx':{3},'.xxxx':{4}},
+    {'oooo.':{0},'ooo.o':{1},'oo.oo':{2},'o.ooo':{3},'.oooo':{4}},
+    {'.xxx..':{1},'..xxx.':{4},'.xx.x.':{2},'.x.xx.':{3}},
+    {'.ooo..':{1,5},'..ooo.':{0,4},'.oo.o.':{2},'.o.oo.':{3}}]
 
 class SimpleGoBoard(object):
     def __hash__(self) -> int:
-        return hash(str(self.board))
+        return self.hash_code()
+
+    def hash_code(self):
+        """
+        64-bit Zobrist code of the position, including the player to move.
+        The stone part is updated incrementally on every move and undo.
+        """
+        return self.stone_key ^ self.zobrist.to_play[self.current_player]
+
+    def canonical_code(self):
+        """
+        (code, symmetry): the smallest hash_code of the 8 rotations and
+        reflections of the position, and the symmetry that gives it.
+        Symmetric positions share their code, so a move m of this position
+        is stored as geometry.symmetries[symmetry][m], and a stored move m
+        is geometry.inverse_symmetries[symmetry][m] here.
+        """
+        return self.zobrist.canonical(self.sym_key, self.current_player)
 
     def get_color(self, point):
         return self.board[point]
@@ -64,7 +101,7 @@ class SimpleGoBoard(object):
         Return:
             The empty points on the board
         """
-        return where1d(self.board == EMPTY)
+        return np.array(sorted(self.empty_set.points), dtype = np.int32)
 
     def __init__(self, size):
         """
@@ -84,20 +121,44 @@ class SimpleGoBoard(object):
         self.WE = 1
         self.ko_recapture = None
         self.current_player = BLACK
+        # winner is kept up to date by play_move_gomoku, win_point made the five
+        self.winner = EMPTY
+        self.win_point = None
         self.maxpoint = size * size + 3 * (size + 1)
-        self.board = np.full(self.maxpoint, BORDER, dtype = np.int32)
+        # shared tables, including the on-the-board neighbors of each point
+        self.geometry = get_geometry(size)
+        self.neighbors = self.geometry.neighbors
+        self.board = np.copy(self.geometry.empty_board)
         self.liberty_of = np.full(self.maxpoint, NULLPOINT, dtype = np.int32)
-        self._initialize_empty_points(self.board)
-        self._initialize_neighbors()
+        self.empty_set = PointSet(self.maxpoint)
+        for point in self.geometry.points:
+            self.empty_set.add(point)
+        # XOR of the Zobrist keys of all stones, see hash_code
+        self.zobrist = get_zobrist_hash(size)
+        self.stone_key = 0
+        # the same for all 8 symmetries, see canonical_code
+        self.sym_key = 0
+        # base-3 code of the stones on each line of geometry.lines,
+        # see linepatterns.py
+        self.line_codes = [0] * len(self.geometry.lines)
+        # win, open four and block points, kept up to date with line_codes
+        self.threats = ThreatTracker(self.geometry.lines)
+        # (point, player to move before it) for every move made by push
+        self.move_stack = []
 
     def copy(self):
-        b = SimpleGoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
-        b.ko_recapture = self.ko_recapture
-        b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
+        """
+        Copy the board. The geometry tables never change, so they are
+        shared with the copy and only the stones are copied.
+        """
+        b = SimpleGoBoard.__new__(SimpleGoBoard)
+        b.__dict__.update(self.__dict__)
         b.board = np.copy(self.board)
+        b.liberty_of = np.copy(self.liberty_of)
+        b.empty_set = self.empty_set.copy()
+        b.line_codes = list(self.line_codes)
+        b.threats = self.threats.copy()
+        b.move_stack = list(self.move_stack)
         return b
 
     def row_start(self, row):
@@ -105,36 +166,6 @@ class SimpleGoBoard(object):
         assert row <= self.size
         return row * self.NS + 1
         
-    def _initialize_empty_points(self, board):
-        """
-        Fills points on the board with EMPTY
-        Argument
-        ---------
-        board: numpy array, filled with BORDER
-        """
-        for row in range(1, self.size + 1):
-            start = self.row_start(row)
-            board[start : start + self.size] = EMPTY
-
-    def _on_board_neighbors(self, point):
-        nbs = []
-        for nb in self._neighbors(point):
-            if self.board[nb] != BORDER:
-                nbs.append(nb)
-        return nbs
-            
-    def _initialize_neighbors(self):
-        """
-        precompute neighbor array.
-        For each point on the board, store its list of on-the-board neighbors
-        """
-        self.neighbors = []
-        for point in range(self.maxpoint):
-            if self.board[point] == BORDER:
-                self.neighbors.append([])
-            else:
-                self.neighbors.append(self._on_board_neighbors(point))
-        
     def is_eye(self, point, color):
         """
         Check if point is a simple eye for color
@@ -244,6 +275,11 @@ class SimpleGoBoard(object):
         if self._has_liberty(opp_block):
             return None
         captures = list(where1d(opp_block))
+        for stone in captures:
+            self.stone_key ^= self.zobrist.array[stone][self.board[stone]]
+            self.sym_key ^= self.zobrist.sym_array[stone][self.board[stone]]
+            self._update_line_codes(stone, -int(self.board[stone]))
+            self.empty_set.add(stone)
         self.board[captures] = EMPTY
         self.liberty_of[captures] = NULLPOINT
         single_capture = None 
@@ -271,6 +307,10 @@ class SimpleGoBoard(object):
         opp_color = GoBoardUtil.opponent(color)
         in_enemy_eye = self._is_surrounded(point, opp_color)
         self.board[point] = color
+        self.empty_set.remove(point)
+        self.stone_key ^= self.zobrist.array[point][color]
+        self.sym_key ^= self.zobrist.sym_array[point][color]
+        self._update_line_codes(point, int(color))
         single_captures = []
         neighbors = self.neighbors[point]
         for nb in neighbors:
@@ -283,6 +323,10 @@ class SimpleGoBoard(object):
             block = self._block_of(point)
             if not self._has_liberty(block): # undo suicide move
                 self.board[point] = EMPTY
+                self.empty_set.add(point)
+                self.stone_key ^= self.zobrist.array[point][color]
+                self.sym_key ^= self.zobrist.sym_array[point][color]
+                self._update_line_codes(point, -int(color))
                 return False
         self.ko_recapture = None
         if in_enemy_eye and len(single_captures) == 1:
@@ -340,6 +384,16 @@ class SimpleGoBoard(object):
             """
         return self.board[point] == EMPTY
     
+    def _update_line_codes(self, point, change):
+        """
+        Add change times the color to the lines through point, and update
+        the threats of those lines
+        """
+        codes = self.line_codes
+        for index, power in self.geometry.line_powers[point]:
+            codes[index] += change * power
+            self.threats.update(index, codes[index])
+
     def play_move_gomoku(self, point, color):
         """
             Play a move of color on point, for the game of gomoku
@@ -350,9 +404,63 @@ class SimpleGoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self.empty_set.remove(point)
+        self.stone_key ^= self.zobrist.array[point][color]
+        self.sym_key ^= self.zobrist.sym_array[point][color]
+        self._update_line_codes(point, int(color))
+        self._update_winner(point, color)
         self.current_player = GoBoardUtil.opponent(color)
         return True
+
+    def undoMove(self, point):
+        """
+            Remove the stone on point and give the turn back to its owner
+            """
+        self.stone_key ^= self.zobrist.array[point][self.board[point]]
+        self.sym_key ^= self.zobrist.sym_array[point][self.board[point]]
+        self._update_line_codes(point, -int(self.board[point]))
+        self.board[point] = EMPTY
+        self.empty_set.add(point)
+        self._clear_winner(point)
+        self.current_player = GoBoardUtil.opponent(self.current_player)
         
+    def push(self, point, color=None):
+        """
+            Play a gomoku move of color on point and record it on the move stack,
+            so that it can be taken back by pop or pop_to.
+            color defaults to the player to move.
+            Returns boolean: whether move was legal
+            """
+        player = self.current_player
+        if color is None:
+            color = player
+        if not self.play_move_gomoku(point, color):
+            return False
+        self.move_stack.append((point, player))
+        return True
+
+    def pop(self):
+        """
+            Take back the last move made by push, and return its point
+            """
+        point, player = self.move_stack.pop()
+        self.undoMove(point)
+        self.current_player = player
+        return point
+
+    def mark(self):
+        """
+            Current height of the move stack, to be passed to pop_to later
+            """
+        return len(self.move_stack)
+
+    def pop_to(self, mark):
+        """
+            Take back all moves pushed since mark was taken
+            """
+        while len(self.move_stack) > mark:
+            self.pop()
+
     def _point_direction_check_connect_gomoko(self, point, shift):
         """
         Check if the point has connect5 condition in a direction
@@ -380,8 +488,7 @@ class SimpleGoBoard(object):
                     break
             else:
                 break
-        assert count <= 5
-        return count == 5
+        return count >= 5
     
     def point_check_game_end_gomoku(self, point):
         """
@@ -405,9 +512,38 @@ class SimpleGoBoard(object):
         
         return False
     
+    def _update_winner(self, point, color):
+        """
+            Record color as the winner if the stone it just played on point
+            completes five in a row. Only the lines through point are checked.
+            """
+        if self.winner == EMPTY and self.point_check_game_end_gomoku(point):
+            self.winner = color
+            self.win_point = point
+
+    def _clear_winner(self, point):
+        """
+            Forget the winner if the stone on point, which is being undone,
+            was the one that made five in a row.
+            """
+        if point == self.win_point:
+            self.winner = EMPTY
+            self.win_point = None
+
     def check_game_end_gomoku(self):
         """
             Check if the game ends for the game of Gomoku.
+            Uses the winner maintained by play_move_gomoku, so this is O(1).
+            """
+        if self.winner != EMPTY:
+            return True, self.winner
+        return False, None
+
+    def scan_game_end_gomoku(self):
+        """
+            Full-board version of check_game_end_gomoku.
+            Only needed for stones that were put on the board without
+            play_move_gomoku.
             """
         white_points = where1d(self.board == WHITE)
         black_points = where1d(self.board == BLACK)
@@ -422,8 +558,14 @@ class SimpleGoBoard(object):
 
         return False, None
 
-    def solve(self):
-        result, move, drawMove = alphabeta.solve(self)
+    def solve(self, tt, solver=alphabeta, timer=NO_DEADLINE):
+        """
+        Solve the position with solver, the alphabeta, pns, parallel or lazysmp module
+        Returns 'unknown' if timer expires first.
+        """
+        result, move, drawMove = solver.solve(self, tt, timer=timer)
+        if timer.stopped:
+            return 'unknown','NoMove'
         if move=="First":
             if result==0:
                 return 'draw',drawMove
@@ -440,29 +582,17 @@ class SimpleGoBoard(object):
             winner='w' if self.current_player==WHITE else 'b'
             return winner, move
 
-    def check_pattern(self,point,have,direction_x,direction_y,moveSet,patternList,color,flag):
-        for i in range(0,4):
-            if have in patternList[i]:
-                for dis in patternList[i][have]:
-                    moveSet[i].add(point-direction_x*(dis+1)-direction_y*self.NS*(dis+1))
-                #flag[0]=True
-                break
-        if (not (0<= point<len(self.board))) or len(have)==9:
-            return
-#if self.get_color(point)==BORDER or len(have)==7:
-#            return
-        piece=self.get_color(point)
-        if piece==EMPTY:
-            piece='.'
-        elif piece==color:
-            piece='x'
-        elif piece == BORDER:
-            piece='B'
-        else:
-            piece='o'
-        have+=piece
-        #print(GoBoardUtil.format_point(self._point_to_coord(point)),have,self.board[point])
-        self.check_pattern(point+direction_x+direction_y*self.NS,have,direction_x,direction_y,moveSet,patternList,color,flag)
+    def _pattern_move_sets(self, name, patternList):
+        """
+        Points suggested by the patterns of patternList for the player to
+        move, one set per category, found with the compiled automaton.
+        """
+        automaton = get_automaton(name, patternList, self.current_player)
+        return automaton.move_sets(self.color_list(), self.geometry)
+
+    def color_list(self):
+        """ The colors of all points, as a list indexed by point """
+        return self.board.tolist()
 
     def get_pattern_moves(self):
         """
@@ -470,32 +600,19 @@ class SimpleGoBoard(object):
         2. urgent blocking point xoooo.
         3. wining in 2 step point
         """
-        moveSet=[set(),set(),set(),set()]
-        color=self.current_player
-
-        patternList=[{'xxxx.':{0},'xxx.x':{1},'xx.xx':{2},'x.xxx':{3},'.xxxx':{4}}, #win
-                     {'oooo.':{0},'ooo.o':{1},'oo.oo':{2},'o.ooo':{3},'.oooo':{4}}, #block win
-                     {'.xxx..':{1},'..xxx.':{4},'.xx.x.':{2},'.x.xx.':{3}}, #make-four
-                     {'.ooo..':{1,5},'..ooo.':{0,4},'.oo.o.':{0,2,5},'.o.oo.':{0,3,5}, 'B.ooo..':{0}, '..ooo.B':{6},
-                     'x.ooo..':{0}, '..ooo.x':{6} #block-open-four
-                     }]
-
-        direction_x=[1,0,1,-1]
-        direction_y=[0,1,1,1]
-        flag=[False]
-
-        for point in range(0, len(self.board)):
-            if flag[0]:
-                break
-            for direction in range(0,4):
-                    self.check_pattern(point,'',direction_x[direction],direction_y[direction],moveSet,patternList,color,flag)
-        
-        i=0
-        while i<4 and not bool(moveSet[i]): i+=1
-        if i==4:
-            return None
-        else:
-            return i, list(moveSet[i])
+        color = self.current_player
+        points = self.threats.points
+        # the win, block win and make-four points are the ones the board
+        # keeps track of, only block-open-four needs a look at the board
+        for i, found in enumerate([points[WINS][color],
+                                   points[WINS][GoBoardUtil.opponent(color)],
+                                   points[OPEN_FOURS][color]]):
+            if found:
+                return i, list(found)
+        moveSet = self._pattern_move_sets("pattern_moves", PATTERN_MOVES)
+        if moveSet[3]:
+            return 3, list(moveSet[3])
+        return None
             
     def list_solve_point(self):
         """
@@ -503,21 +620,7 @@ class SimpleGoBoard(object):
         2. urgent blocking point xoooo.
         3. wining in 2 step point
         """
-        moveSet=[set(),set(),set(),set()]
-        color=self.current_player
-
-        patternList=[{'xxxx.':{0},'xxx.x':{1},'xx.xx':{2},'x.xxx':{3},'.xxxx':{4}},{'oooo.':{0},'ooo.o':{1},'oo.oo':{2},'o.ooo':{3},'.oooo':{4}},{'.xxx..':{1},'..xxx.':{4},'.xx.x.':{2},'.x.xx.':{3}},{'.ooo..':{1,5},'..ooo.':{0,4},'.oo.o.':{2},'.o.oo.':{3}}]
-
-        direction_x=[1,0,1,-1]
-        direction_y=[0,1,1,1]
-        flag=[False]
-
-        for point in where1d(self.board!=BORDER):
-            if flag[0]:
-                break
-            for direction in range(0,4):
-                    self.check_pattern(point,'',direction_x[direction],direction_y[direction],moveSet,patternList,color,flag)
-        
+        moveSet = self._pattern_move_sets("solve_points", SOLVE_POINTS)
         i=0
         while i<4 and not bool(moveSet[i]):
             i+=1
@@ -0,0 +1,94 @@
+"""
+solvedstore.py
+
+A file of solved positions that survives engine restarts and can be
+shared by several engine processes at the same time.
+
+The file is memory-mapped as an array of 16-byte records, grouped in
+buckets of BUCKET_SIZE records indexed by the low bits of the Zobrist
+code. A record holds the result of the position for the player to move
+and the move that achieves it, packed into one 64-bit data word, and
+the Zobrist code XOR-ed with that data word. A reader accepts a record
+only if key ^ data gives back the code it is looking for, so records
+that another process is half way through writing are simply skipped.
+This makes reads and writes lock-free.
+"""
+
+import os
+import numpy as np
+
+# results, from the point of view of the player to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("data", "<u8")])
+BUCKET_SIZE = 4
+DEFAULT_STORE_BYTES = 16 * 1024 * 1024
+
+
+class SolvedStore:
+    def __init__(self, path, max_bytes=DEFAULT_STORE_BYTES):
+        """
+        Open the store in file path, creating it with at most max_bytes
+        if it does not exist yet. An existing file keeps its own size.
+        """
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            num_buckets = 1
+            while (num_buckets * 2 * BUCKET_SIZE * RECORD_DTYPE.itemsize
+                   <= max_bytes):
+                num_buckets *= 2
+            with open(path, "wb") as f:
+                f.truncate(num_buckets * BUCKET_SIZE * RECORD_DTYPE.itemsize)
+        self.path = path
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r+")
+        num_buckets = len(self.records) // BUCKET_SIZE
+        assert num_buckets & (num_buckets - 1) == 0, \
+               "{} is not a solved position store".format(path)
+        self.mask = num_buckets - 1
+        self.keys = self.records["key"]
+        self.datas = self.records["data"]
+
+    def _pack(self, result, move):
+        move = -1 if move is None else int(move)
+        # offset both fields so that the data word of a record is never 0
+        return ((move + 1) << 8) | (result + 2)
+
+    def _unpack(self, data):
+        move = (data >> 8) - 1
+        return (data & 0xff) - 2, None if move == -1 else move
+
+    def lookup(self, code):
+        """
+        Returns (result, move) for the position with Zobrist code,
+        or None if it has not been solved.
+        """
+        start = BUCKET_SIZE * (code & self.mask)
+        for i in range(start, start + BUCKET_SIZE):
+            data = int(self.datas[i])
+            if data != 0 and int(self.keys[i]) ^ data == code:
+                return self._unpack(data)
+        return None
+
+    def store(self, code, result, move):
+        """
+        Record that the player to move in the position with Zobrist code
+        gets result by playing move.
+        """
+        data = self._pack(result, move)
+        start = BUCKET_SIZE * (code & self.mask)
+        slot = None
+        for i in range(start, start + BUCKET_SIZE):
+            old = int(self.datas[i])
+            if old == 0 or int(self.keys[i]) ^ old == code:
+                slot = i
+                break
+        if slot is None:
+            # bucket full, replace a record picked by higher bits of code
+            slot = start + (code >> 32) % BUCKET_SIZE
+        self.keys[slot] = code ^ data
+        self.datas[slot] = data
+
+    def flush(self):
+        """ Write the changes back to the file """
+        self.records.flush()
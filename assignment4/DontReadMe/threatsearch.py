@@ -0,0 +1,231 @@
+"""
+threatsearch.py
+
+Threat-space search for forced wins in Gomoku.
+
+The attacker only plays threats and the defender only plays the replies
+that can stop them, which keeps the search tree tiny compared to a full
+alpha-beta search:
+- VCF (victory by continuous fours): every attacker move makes a four,
+  so the defender has to block its single five point.
+- VCT (victory by continuous threats): the attacker may also make a
+  three, a move after which it can make an open four. The defender then
+  has to play on one of those open four points or their five points, or
+  make a four of its own.
+A win found this way is a proven win.
+
+Works on any board with get_color, push, pop, empty_set, NS and
+current_player, so on both SimpleGoBoard and BitGoBoard.
+"""
+
+from board_util import GoBoardUtil, EMPTY
+from timemanager import NO_DEADLINE
+
+# maximum number of attacker moves in a winning sequence
+VCF_DEPTH = 12
+VCT_DEPTH = 4
+
+
+class ThreatSearch(object):
+    def __init__(self, board, attacker, use_threes, timer=NO_DEADLINE):
+        """
+        Search for a forced win of attacker on board.
+        use_threes selects VCT instead of VCF.
+        Once timer expires no more wins are found, so the search can only
+        miss a win, never claim a wrong one.
+        """
+        self.board = board
+        self.timer = timer
+        self.attacker = attacker
+        self.defender = GoBoardUtil.opponent(attacker)
+        self.use_threes = use_threes
+        self.directions = [1, board.NS, board.NS + 1, board.NS - 1]
+
+    def _run(self, point, d, color):
+        """ Number of stones of color next to point in direction d """
+        count = 0
+        p = point + d
+        while self.board.get_color(p) == color:
+            count += 1
+            p += d
+        return count
+
+    def _makes_five(self, point, color):
+        """ Whether a stone of color on point would make five in a row """
+        for d in self.directions:
+            if 1 + self._run(point, d, color) + self._run(point, -d, color) >= 5:
+                return True
+        return False
+
+    def _five_points(self, color):
+        """ All empty points where color would make five in a row """
+        return [p for p in self.board.empty_set.points
+                if self._makes_five(p, color)]
+
+    def _five_points_near(self, point, color):
+        """
+        Empty points where color would make five in a row through point.
+        They are at most four steps away from point along its lines.
+        """
+        fives = set()
+        for d in self.directions:
+            for step in (d, -d):
+                p = point
+                for _ in range(4):
+                    p += step
+                    c = self.board.get_color(p)
+                    if c == EMPTY:
+                        if self._makes_five(p, color):
+                            fives.add(p)
+                    elif c != color:
+                        break
+        return fives
+
+    def _is_four(self, move, color):
+        """ Whether move of color makes a four, a threat to make five """
+        self.board.push(move, color)
+        four = len(self._five_points_near(move, color)) > 0
+        self.board.pop()
+        return four
+
+    def _is_open_four_point(self, move, color):
+        """ Whether move of color makes two different five points """
+        self.board.push(move, color)
+        open_four = len(self._five_points_near(move, color)) >= 2
+        self.board.pop()
+        return open_four
+
+    def _is_three(self, move, color):
+        """ Whether color can make an open four after playing move """
+        board = self.board
+        board.push(move, color)
+        three = False
+        for d in self.directions:
+            for step in (d, -d):
+                p = move
+                for _ in range(4):
+                    p += step
+                    c = board.get_color(p)
+                    if c == EMPTY:
+                        if self._is_open_four_point(p, color):
+                            three = True
+                            break
+                    elif c != color:
+                        break
+                if three:
+                    break
+            if three:
+                break
+        board.pop()
+        return three
+
+    def _threat_moves(self):
+        """ The fours of the attacker, followed by its threes for VCT """
+        empty = list(self.board.empty_set.points)
+        fours = [m for m in empty if self._is_four(m, self.attacker)]
+        if not self.use_threes:
+            return fours
+        threes = [m for m in empty
+                  if m not in fours and self._is_three(m, self.attacker)]
+        return fours + threes
+
+    def _three_defenses(self):
+        """
+        Replies of the defender to a three of the attacker: the open four
+        points of the attacker, their five points, and the fours of the
+        defender. Any other move lets the attacker make an open four.
+        """
+        board = self.board
+        replies = set()
+        for q in list(board.empty_set.points):
+            board.push(q, self.attacker)
+            fives = self._five_points_near(q, self.attacker)
+            board.pop()
+            if len(fives) >= 2:
+                replies.add(q)
+                replies.update(fives)
+        if not replies:
+            return None
+        for m in list(board.empty_set.points):
+            if m not in replies and self._is_four(m, self.defender):
+                replies.add(m)
+        return replies
+
+    def attack(self, depth):
+        """
+        Attacker to move. Returns a move that wins by threats within depth
+        attacker moves, or None.
+        """
+        wins = self._five_points(self.attacker)
+        if wins:
+            return wins[0]
+        if depth == 0 or self.timer.expired():
+            return None
+        blocks = self._five_points(self.defender)
+        if len(blocks) >= 2:
+            return None
+        if blocks:
+            # the four of the defender must be blocked first
+            candidates = blocks
+        else:
+            candidates = self._threat_moves()
+        for move in candidates:
+            self.board.push(move, self.attacker)
+            win = self.defend(depth - 1)
+            self.board.pop()
+            if win:
+                return move
+        return None
+
+    def defend(self, depth):
+        """
+        Defender to move. Returns True if the attacker wins against every
+        reply to its threat.
+        """
+        if self._five_points(self.defender):
+            return False
+        fives = self._five_points(self.attacker)
+        if len(fives) >= 2:
+            return True
+        if len(fives) == 1:
+            replies = fives
+        elif self.use_threes:
+            replies = self._three_defenses()
+            if replies is None:
+                return False
+        else:
+            return False
+        for reply in replies:
+            self.board.push(reply, self.defender)
+            win = self.attack(depth)
+            self.board.pop()
+            if win is None:
+                return False
+        return True
+
+
+def find_vcf(board, max_depth=VCF_DEPTH, timer=NO_DEADLINE):
+    """
+    A move that wins for the player to move by continuous fours, or None.
+    """
+    return ThreatSearch(board, board.current_player, False,
+                        timer).attack(max_depth)
+
+
+def find_vct(board, max_depth=VCT_DEPTH, timer=NO_DEADLINE):
+    """
+    A move that wins for the player to move by fours and threes, or None.
+    """
+    return ThreatSearch(board, board.current_player, True,
+                        timer).attack(max_depth)
+
+
+def find_threat_win(board, timer=NO_DEADLINE):
+    """
+    A move that wins for the player to move by VCF or VCT, or None.
+    VCF is tried first since its tree is much smaller.
+    """
+    move = find_vcf(board, timer=timer)
+    if move is None:
+        move = find_vct(board, timer=timer)
+    return move
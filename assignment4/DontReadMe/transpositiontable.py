@@ -0,0 +1,362 @@
+"""
+transpositiontable.py
+
+Fixed-capacity transposition tables for the alpha-beta search.
+
+The table is an array of buckets indexed by the low bits of the Zobrist
+code. Each bucket has two slots: a depth-preferred slot that keeps the
+entry with the largest remaining depth, and an always-replace slot that
+takes every other entry. Each entry records whether its score is exact
+or only a lower or upper bound, so cutoff results are not reused as
+exact values.
+
+TranspositionTable keeps the entries as Python tuples in a list.
+ArrayTranspositionTable packs them into 16-byte slots of one preallocated
+numpy structured array, which holds about ten times more entries in the
+same memory. SharedTranspositionTable keeps its slots in shared memory,
+so that several search processes can use one table at the same time.
+All three have the same store/lookup interface.
+"""
+
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+
+# bound types of a stored score
+EXACT = 0
+LOWER = 1  # score is a lower bound, the search failed high
+UPPER = 2  # score is an upper bound, the search failed low
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# approximate memory used by one slot: list cell, tuple and its ints
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Create a table that uses at most about max_bytes of memory.
+        The number of buckets is rounded down to a power of two.
+        """
+        num_buckets = 1
+        while num_buckets * 4 * ENTRY_BYTES <= max_bytes:
+            num_buckets *= 2
+        self.num_buckets = num_buckets
+        self.mask = num_buckets - 1
+        # slot 2*b is the depth-preferred, 2*b+1 the always-replace slot
+        # of bucket b. Entries are (code, score, flag, depth, move)
+        self.slots = [None] * (2 * num_buckets)
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.lookups = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        self.slots = [None] * (2 * self.num_buckets)
+        self.clear_stats()
+
+    def store(self, code, score, flag, depth, move):
+        """
+        Store the search result for the position with Zobrist code.
+        depth is the remaining search depth the score is valid for.
+        """
+        self.stores += 1
+        i = 2 * (code & self.mask)
+        entry = (code, score, flag, depth, move)
+        old = self.slots[i]
+        if old is None or old[0] == code or depth >= old[3]:
+            if old is not None and old[0] != code:
+                # demote the old entry instead of dropping it
+                self._overwrite(i + 1, old)
+            self.slots[i] = entry
+        elif self.slots[i + 1] is None or self.slots[i + 1][0] == code:
+            self.slots[i + 1] = entry
+        else:
+            self._overwrite(i + 1, entry)
+
+    def _overwrite(self, i, entry):
+        if self.slots[i] is not None:
+            self.overwrites += 1
+        self.slots[i] = entry
+
+    def lookup(self, code):
+        """
+        Returns (score, flag, depth, move) for the position with
+        Zobrist code, or None if it is not in the table.
+        """
+        self.lookups += 1
+        i = 2 * (code & self.mask)
+        for entry in (self.slots[i], self.slots[i + 1]):
+            if entry is not None and entry[0] == code:
+                self.hits += 1
+                return entry[1:]
+        if self.slots[i] is not None:
+            self.collisions += 1
+        return None
+
+    def fill(self):
+        """ Fraction of the slots that are in use """
+        used = len(self.slots) - self.slots.count(None)
+        return used / len(self.slots)
+
+    def stats(self):
+        return ("lookups {} hits {} collisions {} stores {} overwrites {} "
+                "fill {:.3f}".format(self.lookups, self.hits,
+                                     self.collisions, self.stores,
+                                     self.overwrites, self.fill()))
+
+
+# one 16-byte slot of ArrayTranspositionTable. code 0 marks an empty slot,
+# move -1 is None, depth is capped at 255
+SLOT_DTYPE = np.dtype([("code", "<u8"), ("score", "<i4"), ("move", "<i2"),
+                       ("depth", "u1"), ("flag", "u1")])
+MAX_SLOT_DEPTH = 255
+
+
+class ArrayTranspositionTable:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Create a table that uses at most max_bytes of memory.
+        The number of buckets is rounded down to a power of two.
+        """
+        num_buckets = 1
+        while num_buckets * 4 * SLOT_DTYPE.itemsize <= max_bytes:
+            num_buckets *= 2
+        self.num_buckets = num_buckets
+        self.mask = num_buckets - 1
+        self.table = np.zeros(2 * num_buckets, dtype=SLOT_DTYPE)
+        # views of the fields, indexing them is cheaper than records
+        self.codes = self.table["code"]
+        self.scores = self.table["score"]
+        self.moves = self.table["move"]
+        self.depths = self.table["depth"]
+        self.flags = self.table["flag"]
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.lookups = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        self.table.fill(0)
+        self.clear_stats()
+
+    def store(self, code, score, flag, depth, move):
+        """
+        Store the search result for the position with Zobrist code.
+        depth is the remaining search depth the score is valid for.
+        """
+        self.stores += 1
+        depth = min(depth, MAX_SLOT_DEPTH)
+        i = 2 * (code & self.mask)
+        old_code = int(self.codes[i])
+        if old_code == 0 or old_code == code or depth >= self.depths[i]:
+            if old_code != 0 and old_code != code:
+                # demote the old entry instead of dropping it
+                if self.codes[i + 1] != 0:
+                    self.overwrites += 1
+                self.table[i + 1] = self.table[i]
+            self._write(i, code, score, flag, depth, move)
+        else:
+            other_code = int(self.codes[i + 1])
+            if other_code != 0 and other_code != code:
+                self.overwrites += 1
+            self._write(i + 1, code, score, flag, depth, move)
+
+    def _write(self, i, code, score, flag, depth, move):
+        # the code goes in last, so a write interrupted half way through
+        # (by Ctrl-C, say) leaves an empty slot, not a wrong entry
+        self.codes[i] = 0
+        self.scores[i] = score
+        self.flags[i] = flag
+        self.depths[i] = depth
+        self.moves[i] = -1 if move is None else move
+        self.codes[i] = code
+
+    def lookup(self, code):
+        """
+        Returns (score, flag, depth, move) for the position with
+        Zobrist code, or None if it is not in the table.
+        """
+        self.lookups += 1
+        i = 2 * (code & self.mask)
+        for j in (i, i + 1):
+            if self.codes[j] == code:
+                self.hits += 1
+                move = int(self.moves[j])
+                return (int(self.scores[j]), int(self.flags[j]),
+                        int(self.depths[j]), None if move == -1 else move)
+        if self.codes[i] != 0:
+            self.collisions += 1
+        return None
+
+    def fill(self):
+        """ Fraction of the slots that are in use """
+        return np.count_nonzero(self.codes) / len(self.codes)
+
+    def stats(self):
+        return ("lookups {} hits {} collisions {} stores {} overwrites {} "
+                "fill {:.3f}".format(self.lookups, self.hits,
+                                     self.collisions, self.stores,
+                                     self.overwrites, self.fill()))
+
+
+# one 16-byte slot of SharedTranspositionTable: the entry packed into one
+# data word, and the Zobrist code XOR-ed with it. data 0 is an empty slot
+SHARED_DTYPE = np.dtype([("key", "<u8"), ("data", "<u8")])
+# processes that can write to one table, numbered from 0
+MAX_WORKERS = 64
+# per-worker counters, kept after the slots in the shared memory block
+LOOKUPS, HITS, CROSS_HITS, COLLISIONS, STORES, OVERWRITES = range(6)
+NUM_COUNTERS = 6
+
+
+class SharedTranspositionTable:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, name=None, worker=0):
+        """
+        Create a table in a new shared memory block that uses at most
+        max_bytes, or attach to the block called name that another
+        process created. The number of buckets is rounded down to a
+        power of two.
+        worker numbers the calling process, from 0 to MAX_WORKERS - 1.
+        Entries record the worker that wrote them, so the statistics can
+        tell hits on a worker's own entries from hits on other workers'.
+
+        Slots are written and read without locks: a reader accepts a slot
+        only if key ^ data gives back its code, so a slot another process
+        is half way through writing is simply a miss.
+        """
+        assert 0 <= worker < MAX_WORKERS
+        counter_bytes = MAX_WORKERS * NUM_COUNTERS * 8
+        if name is None:
+            num_buckets = 1
+            while (num_buckets * 4 * SHARED_DTYPE.itemsize + counter_bytes
+                   <= max_bytes):
+                num_buckets *= 2
+            self.shm = shared_memory.SharedMemory(
+                create=True,
+                size=2 * num_buckets * SHARED_DTYPE.itemsize + counter_bytes)
+            # the creator removes the block once it no longer uses it
+            weakref.finalize(self, self.shm.unlink)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            num_buckets = ((self.shm.size - counter_bytes)
+                           // (2 * SHARED_DTYPE.itemsize))
+        weakref.finalize(self, self.shm.close)
+        self.name = self.shm.name
+        self.worker = worker
+        self.num_buckets = num_buckets
+        self.mask = num_buckets - 1
+        self.table = np.ndarray(2 * num_buckets, dtype=SHARED_DTYPE,
+                                buffer=self.shm.buf)
+        self.keys = self.table["key"]
+        self.datas = self.table["data"]
+        self.counters = np.ndarray((MAX_WORKERS, NUM_COUNTERS),
+                                   dtype=np.int64, buffer=self.shm.buf,
+                                   offset=self.table.nbytes)
+        self.own_counters = self.counters[worker]
+        if name is None:
+            self.clear()
+
+    def clear_stats(self):
+        self.counters.fill(0)
+
+    def clear(self):
+        """ Empty the table. No other process may be using it. """
+        self.table.fill(0)
+        self.clear_stats()
+
+    def _pack(self, score, flag, depth, move):
+        # score offset to be unsigned, so data is never 0
+        move = -1 if move is None else int(move)
+        return ((int(score) + (1 << 31))
+                | (move + 1) << 32
+                | min(depth, MAX_SLOT_DEPTH) << 48
+                | flag << 56
+                | self.worker << 58)
+
+    def _unpack(self, data):
+        """ (score, flag, depth, move, worker) of a data word """
+        move = ((data >> 32) & 0xffff) - 1
+        return ((data & 0xffffffff) - (1 << 31), (data >> 56) & 0x3,
+                (data >> 48) & 0xff, None if move == -1 else move,
+                data >> 58)
+
+    def _code(self, i):
+        """ The code of the entry in slot i, or None if there is none """
+        data = int(self.datas[i])
+        if data == 0:
+            return None
+        return int(self.keys[i]) ^ data
+
+    def store(self, code, score, flag, depth, move):
+        """
+        Store the search result for the position with Zobrist code.
+        depth is the remaining search depth the score is valid for.
+        """
+        self.own_counters[STORES] += 1
+        data = self._pack(score, flag, depth, move)
+        i = 2 * (code & self.mask)
+        old_code = self._code(i)
+        if (old_code is None or old_code == code
+                or depth >= (int(self.datas[i]) >> 48) & 0xff):
+            if old_code is not None and old_code != code:
+                # demote the old entry instead of dropping it
+                if self._code(i + 1) is not None:
+                    self.own_counters[OVERWRITES] += 1
+                self.table[i + 1] = self.table[i]
+            j = i
+        else:
+            other_code = self._code(i + 1)
+            if other_code is not None and other_code != code:
+                self.own_counters[OVERWRITES] += 1
+            j = i + 1
+        self.keys[j] = code ^ data
+        self.datas[j] = data
+
+    def lookup(self, code):
+        """
+        Returns (score, flag, depth, move) for the position with
+        Zobrist code, or None if it is not in the table.
+        """
+        self.own_counters[LOOKUPS] += 1
+        i = 2 * (code & self.mask)
+        for j in (i, i + 1):
+            data = int(self.datas[j])
+            if data != 0 and int(self.keys[j]) ^ data == code:
+                score, flag, depth, move, writer = self._unpack(data)
+                self.own_counters[HITS] += 1
+                if writer != self.worker:
+                    self.own_counters[CROSS_HITS] += 1
+                return (score, flag, depth, move)
+        if self.datas[i] != 0:
+            self.own_counters[COLLISIONS] += 1
+        return None
+
+    def fill(self):
+        """ Fraction of the slots that are in use """
+        return np.count_nonzero(self.datas) / len(self.datas)
+
+    def stats(self):
+        """
+        Statistics summed over all workers, and the hits of each worker
+        that used the table, how many of them were on entries written by
+        other workers.
+        """
+        total = self.counters.sum(axis=0)
+        workers = " ".join(
+            "{}:{}/{}".format(w, self.counters[w, CROSS_HITS],
+                              self.counters[w, HITS])
+            for w in range(MAX_WORKERS) if self.counters[w, LOOKUPS] > 0)
+        return ("lookups {} hits {} cross-worker hits {} collisions {} "
+                "stores {} overwrites {} fill {:.3f} workers {}".format(
+                    total[LOOKUPS], total[HITS], total[CROSS_HITS],
+                    total[COLLISIONS], total[STORES], total[OVERWRITES],
+                    self.fill(), workers))
@@ -0,0 +1,71 @@
+import random
+from board_util import is_black_white
+from geometry import get_geometry
+
+NUM_SYMMETRIES = 8
+KEY_BITS = 64
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+class ZobristHash:
+    def __init__(self, boardSize):
+        """
+        64-bit Zobrist keys for every point and color of a padded board
+        of given size, plus one key per player to move.
+        The keys are drawn from a generator seeded with the board size,
+        so every process gets the same keys.
+        The board keeps its code up to date by XOR-ing these keys on every
+        move, see SimpleGoBoard.hash_code.
+        sym_array packs the keys of a point under all 8 symmetries of the
+        board into one integer, 64 bits per symmetry, so that a single XOR
+        per move keeps the codes of all 8 symmetric positions up to date,
+        see SimpleGoBoard.canonical_code.
+        """
+        rng = random.Random(boardSize)
+        self.maxpoint = boardSize * boardSize + 3 * (boardSize + 1)
+        self.array = [[rng.getrandbits(64) for j in range(3)]
+                      for i in range(self.maxpoint)]
+        self.to_play = [rng.getrandbits(64) for j in range(3)]
+        symmetries = get_geometry(boardSize).symmetries
+        self.sym_array = [[sum(self.array[perm[i]][j] << (KEY_BITS * s)
+                               for s, perm in enumerate(symmetries))
+                           for j in range(3)]
+                          for i in range(self.maxpoint)]
+
+    def hash(self, board):
+        """
+        Compute the code of board from scratch.
+        Only needed for stones that were put on the board without play_move.
+        """
+        code = self.to_play[board.current_player]
+        for point in range(self.maxpoint):
+            color = board.get_color(point)
+            if is_black_white(color):
+                code = code ^ self.array[point][color]
+        return code
+
+    def canonical(self, sym_key, current_player):
+        """
+        The smallest code of the 8 symmetric positions with packed stone
+        keys sym_key and current_player to move, and its symmetry.
+        """
+        to_play = self.to_play[current_player]
+        best, best_sym = None, 0
+        for s in range(NUM_SYMMETRIES):
+            code = (sym_key & KEY_MASK) ^ to_play
+            if best is None or code < best:
+                best, best_sym = code, s
+            sym_key >>= KEY_BITS
+        return best, best_sym
+
+
+_hashes = {}
+
+
+def get_zobrist_hash(boardSize):
+    """
+    The shared ZobristHash for boards of given size.
+    """
+    if boardSize not in _hashes:
+        _hashes[boardSize] = ZobristHash(boardSize)
+    return _hashes[boardSize]
@@ -5,9 +5,40 @@
 from gtp_connection import GtpConnection
 from board_util import GoBoardUtil, EMPTY
 from simple_board import SimpleGoBoard
+from batchplayout import BatchPlayouts
+from timemanager import NO_DEADLINE
 
 import random
+import sys
+import time
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# playouts per move when get_move has neither a deadline nor a
+# simulation budget
+DEFAULT_SIMULATIONS_PER_MOVE = 1000
+# playouts of each move in one task of a worker process, enough to
+# outweigh the cost of sending the task
+PLAYOUTS_PER_TASK = 100
+
+# the board and BatchPlayouts of each board size in a worker process,
+# made by its first task for that size and kept for the rest of the game
+_worker_boards = {}
+
+
+def _playout_task(size, colors, toplay, moves, num_playouts, seed):
+    """
+    Worker process: BatchPlayouts.playouts of moves for toplay on a board
+    of size with colors, with a random stream of its own from seed.
+    """
+    if size not in _worker_boards:
+        board = SimpleGoBoard(size)
+        _worker_boards[size] = board, BatchPlayouts(board)
+    board, batch = _worker_boards[size]
+    board.board = colors
+    board.current_player = toplay
+    return batch.playouts(board, moves, num_playouts,
+                          np.random.default_rng(seed))
 
 def undo(board,move):
     board.board[move]=EMPTY
@@ -33,9 +64,22 @@ class GomokuSimulationPlayer(object):
     then select the one with best win-rate.
     playout could be either random or rule_based (i.e., uses pre-defined patterns) 
     """
-    def __init__(self, n_simualtions_per_move=10, playout_policy='random', board_size=7):
+    def __init__(self, n_simualtions_per_move=10, playout_policy='random', board_size=7,
+                 processes=1, max_simulations_per_move=None, seed=None):
+        """
+        With processes > 1, random playouts run on a pool of that many
+        worker processes. get_move stops after max_simulations_per_move
+        playouts of each move, or at the deadline of its timer.
+        seed seeds the random streams of the playouts.
+        """
         assert(playout_policy in ['random', 'rule_based'])
         self.n_simualtions_per_move=n_simualtions_per_move
+        self.processes=processes
+        self.max_simulations_per_move=max_simulations_per_move
+        self.seed_sequence=np.random.SeedSequence(seed)
+        # kept for all moves of the game, made on first use
+        self.executor=None
+        self.executor_processes=0
         self.board_size=board_size
         self.playout_policy=playout_policy
 
@@ -45,6 +89,9 @@ class GomokuSimulationPlayer(object):
         self.name="Gomoku3"
         self.version = 3.0
         self.best_move=None
+        self.rng=np.random.default_rng(self.seed_sequence.spawn(1)[0])
+        # BatchPlayouts for random playouts, made for the board size in use
+        self.batch=None
     
     def set_playout_policy(self, playout_policy='random'):
         assert(playout_policy in ['random', 'rule_based'])
@@ -65,10 +112,17 @@ class GomokuSimulationPlayer(object):
             movetype_id, moves=ret
             return self.pattern_list[movetype_id], moves
     
-    def _do_playout(self, board, color_to_play):
+    def _do_playout(self, board, color_to_play, deadline=None):
+        """
+        Play a game to the end, 1.0, 0.0 or -1.0 for a win, draw or loss
+        of color_to_play, or None if the perf_counter deadline passes
+        first. The board is left as it was.
+        """
         res=game_result(board)
         simulation_moves=[]
         while(res is None):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
             _ , candidate_moves = self.policy_moves(board, board.current_player)
             playout_move=random.choice(candidate_moves)
             play_move(board, playout_move, board.current_player)
@@ -76,6 +130,8 @@ class GomokuSimulationPlayer(object):
             res=game_result(board)
         for m in simulation_moves[::-1]:
             undo(board, m)
+        if res is None:
+            return None
         if res == color_to_play:
             return 1.0
         elif res == 'draw':
@@ -84,18 +140,37 @@ class GomokuSimulationPlayer(object):
             assert(res == GoBoardUtil.opponent(color_to_play))
             return -1.0
 
-    def get_move(self, board, color_to_play):
+    def _within_budget(self, visits, deadline):
         """
-        The genmove function called by gtp_connection
+        Whether get_move may play more playouts, after visits playouts of
+        each move.
+        """
+        limit=self.max_simulations_per_move
+        if limit is None and deadline is None:
+            limit=DEFAULT_SIMULATIONS_PER_MOVE
+        if limit is not None and visits >= limit:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    def get_move(self, board, color_to_play, timer=NO_DEADLINE):
+        """
+        The genmove function called by gtp_connection.
+        Stops at the deadline of timer, or after the simulation budget.
         """
         moves=GoBoardUtil.generate_legal_moves_gomoku(board)
+        deadline=timer.deadline
+        if self.playout_policy=='random':
+            return self._get_move_batched(board, moves, deadline)
         toplay=board.current_player
         best_result, best_move=-1.1, None
         best_move=moves[0]
         wins = np.zeros(len(moves))
         visits = np.zeros(len(moves))
-        while True:
+        while self._within_budget(visits[0], deadline):
             for i, move in enumerate(moves):
+                # a round of slow rule-based playouts can outlast the time
+                if not self._within_budget(visits[i], deadline):
+                    break
                 play_move(board, move, toplay)
                 res=game_result(board)
                 if res == toplay:
@@ -103,7 +178,10 @@ class GomokuSimulationPlayer(object):
                     #This move is a immediate win
                     self.best_move=move
                     return move
-                ret=self._do_playout(board, toplay)
+                ret=self._do_playout(board, toplay, deadline)
+                if ret is None:
+                    undo(board, move)
+                    break
                 wins[i] += ret
                 visits[i] += 1
                 win_rate = wins[i] / visits[i]
@@ -115,13 +193,98 @@ class GomokuSimulationPlayer(object):
         assert(best_move is not None)
         return best_move
 
-def run():
+    def _get_move_batched(self, board, moves, deadline):
+        """
+        get_move for random playouts: every round plays playouts of all
+        moves in numpy batches, in this process or on the worker pool.
+        """
+        toplay=board.current_player
+        for move in moves:
+            play_move(board, move, toplay)
+            res=game_result(board)
+            undo(board, move)
+            if res == toplay:
+                #This move is a immediate win
+                self.best_move=move
+                return move
+        best_move=moves[0]
+        self.best_move=best_move
+        wins = np.zeros(len(moves))
+        visits = np.zeros(len(moves))
+        while self._within_budget(visits[0], deadline):
+            if self.processes > 1:
+                won, lost, played = self._parallel_round(board, moves, visits[0])
+            else:
+                won, lost, played = self._batch_round(board, moves, visits[0])
+            wins += won - lost
+            visits += played
+            # the move with the best win rate over all rounds so far
+            best_move=moves[int(np.argmax(wins / visits))]
+            self.best_move=best_move
+        return best_move
+
+    def _round_playouts(self, per_round, visits):
+        """ Playouts of each move in the next round, within the budget """
+        if self.max_simulations_per_move is None:
+            return per_round
+        return int(min(per_round, self.max_simulations_per_move - visits))
+
+    def _batch_round(self, board, moves, visits):
+        """
+        n_simualtions_per_move playouts of all moves in this process.
+        Returns (wins, losses, playouts) of each move.
+        """
+        if self.batch is None or self.batch.maxpoint != board.maxpoint:
+            self.batch=BatchPlayouts(board)
+        num_playouts=self._round_playouts(self.n_simualtions_per_move, visits)
+        won, _, lost = self.batch.playouts(board, moves, num_playouts,
+                                           self.rng)
+        return won, lost, num_playouts
+
+    def _parallel_round(self, board, moves, visits):
+        """
+        PLAYOUTS_PER_TASK playouts of all moves, with the moves split
+        over the worker processes.
+        Returns (wins, losses, playouts) of each move.
+        """
+        if self.executor is None or self.executor_processes != self.processes:
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.executor=ProcessPoolExecutor(self.processes)
+            self.executor_processes=self.processes
+        num_playouts=self._round_playouts(PLAYOUTS_PER_TASK, visits)
+        chunks=np.array_split(np.arange(len(moves)), self.processes)
+        chunks=[chunk for chunk in chunks if len(chunk)]
+        seeds=self.seed_sequence.spawn(len(chunks))
+        futures=[self.executor.submit(
+                     _playout_task, board.size, board.board,
+                     board.current_player, np.asarray(moves)[chunk],
+                     num_playouts, seed)
+                 for chunk, seed in zip(chunks, seeds)]
+        won=np.zeros(len(moves))
+        lost=np.zeros(len(moves))
+        try:
+            for chunk, future in zip(chunks, futures):
+                won[chunk], _, lost[chunk] = future.result()
+        finally:
+            # if the round is cut short, its tasks must not stay queued on
+            # the executor ahead of the next round's
+            for future in futures:
+                future.cancel()
+        return won, lost, num_playouts
+
+def run(processes=1):
     """
     start the gtp connection and wait for commands.
+    processes is the number of worker processes for the playouts.
     """
     board = SimpleGoBoard(7)
-    con = GtpConnection(GomokuSimulationPlayer(), board)
+    con = GtpConnection(GomokuSimulationPlayer(processes=processes), board)
     con.start_connection()
 
 if __name__=='__main__':
-    run()
+    args = sys.argv[1:]
+    processes = 1
+    if '--processes' in args:
+        processes = int(args[args.index('--processes') + 1])
+    run(processes)
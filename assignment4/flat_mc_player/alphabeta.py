@@ -1,4 +1,5 @@
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER
+from timemanager import NO_DEADLINE
 #from profilehooks import profile
 
 def undo(board,move):
@@ -15,8 +16,11 @@ def game_end(board):
         return 0
     return None
 
-def alphabeta(board,alpha,beta):
+def alphabeta(board,alpha,beta,timer=NO_DEADLINE):
     #print(GoBoardUtil.get_twoD_board(board),alpha,beta)
+    # out of time: return right away, the result is thrown away
+    if timer.expired():
+        return 0
     result=game_end(board)
     if (result!=None):
         return result
@@ -24,7 +28,7 @@ def alphabeta(board,alpha,beta):
     if solvePoint:
         #print(solvePoint[0])
         board.play_move_gomoku(solvePoint[0],board.current_player)
-        result=-alphabeta(board,-beta,-alpha)
+        result=-alphabeta(board,-beta,-alpha,timer)
         if(result>alpha):
             alpha=result
         undo(board,solvePoint[0])
@@ -33,7 +37,7 @@ def alphabeta(board,alpha,beta):
     else:
         for m in GoBoardUtil.generate_legal_moves_gomoku(board):
             board.play_move_gomoku(m,board.current_player)
-            result=-alphabeta(board,-beta,-alpha)
+            result=-alphabeta(board,-beta,-alpha,timer)
             if(result>alpha):
                 alpha=result
             undo(board,m)
@@ -43,37 +47,44 @@ def alphabeta(board,alpha,beta):
 
 #@profile
 """
-if have winning move, return _,winning_move
-else return have_draw,"NoMove"
+if have winning move, return _,winning_move,None
+else return have_draw,"NoMove",drawing_move
 """
-def solve(board):
+def solve(board,timer=NO_DEADLINE):
     result=game_end(board)
     if (result!=None):
-        return result,"First"
+        return result,"First",None
     alpha,beta=-1,1
     haveDraw=False
+    drawMove=None
     solvePoint=board.list_solve_point()
     if solvePoint:
         #print(solvePoint[0])
         board.play_move_gomoku(solvePoint[0],board.current_player)
-        result=-alphabeta(board,-beta,-alpha)
+        result=-alphabeta(board,-beta,-alpha,timer)
         undo(board,solvePoint[0])
+        if timer.stopped:
+            return False,"NoMove",None
         if(result==1):
-            return True,solvePoint[0]
+            return True,solvePoint[0],None
         elif(result==0):
             haveDraw=True
+            drawMove=solvePoint[0]
     else: 
         for m in GoBoardUtil.generate_legal_moves_gomoku(board):
             board.play_move_gomoku(m,board.current_player)
-            result=-alphabeta(board,-beta,-alpha)
+            result=-alphabeta(board,-beta,-alpha,timer)
             #print(GoBoardUtil.get_twoD_board(board))
             #print(result)
             undo(board,m)
+            if timer.stopped:
+                return False,"NoMove",None
             if(result==1):
-                return True,m
-            elif(result==0):
+                return True,m,None
+            elif(result==0 and not haveDraw):
                 haveDraw=True
-    return haveDraw,"NoMove"
+                drawMove=m
+    return haveDraw,"NoMove",drawMove
 
 
     """
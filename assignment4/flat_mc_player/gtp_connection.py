@@ -12,7 +12,7 @@ from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
                        MAXSIZE, coord_to_point
 import numpy as np
 import re
-import signal
+from timemanager import TimeManager
 
 class GtpConnection():
 
@@ -30,7 +30,6 @@ class GtpConnection():
         self._debug_mode = debug_mode
         self.go_engine = go_engine
         self.board = board
-        signal.signal(signal.SIGALRM, self.handler)
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -284,26 +283,16 @@ class GtpConnection():
         self.timelimit = args[0]
         self.respond('')
 
-    def handler(self, signum, fram):
-        self.board = self.sboard
-        raise Exception("unknown")
-
     def solve_cmd(self, args):
-        try:
-            self.sboard = self.board.copy()
-            signal.alarm(int(self.timelimit)-1)
-            winner,move = self.board.solve()
-            self.board = self.sboard
-            signal.alarm(0)
-            if move != "NoMove":
-                if move == None:
-                    self.respond('{} {}'.format(winner, self.board._point_to_coord(move)))
-                    return 
-                self.respond('{} {}'.format(winner, format_point(point_to_coord(move, self.board.size))))
+        timer = TimeManager.for_command(float(self.timelimit))
+        winner,move = self.board.solve(timer)
+        if move != "NoMove":
+            if move == None:
+                self.respond('{} {}'.format(winner, self.board._point_to_coord(move)))
                 return 
-            self.respond('{}'.format(winner))
-        except Exception as e:
-            self.respond('{}'.format(str(e)))
+            self.respond('{} {}'.format(winner, format_point(point_to_coord(move, self.board.size))))
+            return 
+        self.respond('{}'.format(winner))
 
     def genmove_cmd(self, args):
         """
@@ -323,15 +312,8 @@ class GtpConnection():
         if board_is_full:
             self.respond("pass")
             return
-        move=None
-        try:
-            signal.alarm(int(self.timelimit))
-            self.sboard = self.board.copy()
-            move = self.go_engine.get_move(self.board, color)
-            self.board=self.sboard
-            signal.alarm(0)
-        except Exception as e:
-            move=self.go_engine.best_move
+        timer = TimeManager.for_command(float(self.timelimit))
+        move = self.go_engine.get_move(self.board, color, timer)
 
         if move == PASS:
             self.respond("pass")
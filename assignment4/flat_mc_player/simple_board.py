@@ -14,6 +14,7 @@ from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, \
                        PASS, is_black_white, coord_to_point, where1d, \
                        MAXSIZE, NULLPOINT
 import alphabeta
+from timemanager import NO_DEADLINE
 
 class SimpleGoBoard(object):
 
@@ -420,8 +421,14 @@ class SimpleGoBoard(object):
 
         return False, None
 
-    def solve(self):
-        result, move, drawMove = alphabeta.solve(self)
+    def solve(self, timer=NO_DEADLINE):
+        """
+        Solve the position with alphabeta.
+        Returns 'unknown' if timer expires first.
+        """
+        result, move, drawMove = alphabeta.solve(self, timer)
+        if timer.stopped:
+            return 'unknown','NoMove'
         if move=="First":
             if result==0:
                 return 'draw',drawMove
@@ -0,0 +1,89 @@
+"""
+timemanager.py
+
+Cooperative time control for the searches.
+
+A TimeManager holds a deadline in time.perf_counter seconds. Searches
+poll expired() as they go; it only reads the clock every check_interval
+calls, so it is cheap enough to call at every node. Once the deadline has
+passed it keeps returning True, every search level returns right away,
+and the caller answers with the best result completed so far. Nothing is
+interrupted half way, so no search state has to be repaired afterwards.
+
+time.perf_counter is the system-wide monotonic clock, so a deadline can
+be handed to worker processes on the same machine.
+"""
+
+import time
+
+# searches read the clock once every this many polls
+CHECK_INTERVAL = 256
+# seconds kept back from the time limit of a command to answer it
+SAFETY_MARGIN = 0.1
+# iterative searches start no new iteration after this part of the time,
+# since the next one takes longer than all earlier ones together
+SOFT_SHARE = 0.5
+
+
+class TimeManager(object):
+    def __init__(self, seconds=None, check_interval=CHECK_INTERVAL):
+        """
+        A deadline seconds from now, or none at all if seconds is None.
+        """
+        self.start = time.perf_counter()
+        self.deadline = None if seconds is None else self.start + seconds
+        self.check_interval = check_interval
+        self.polls = 0
+        self.stopped = False
+
+    @classmethod
+    def for_command(cls, time_limit, **kwargs):
+        """ The time manager of a command with time_limit seconds """
+        return cls(max(0.0, time_limit - SAFETY_MARGIN), **kwargs)
+
+    @classmethod
+    def until(cls, deadline, **kwargs):
+        """ A time manager for the perf_counter deadline of another one """
+        timer = cls(**kwargs)
+        timer.deadline = deadline
+        return timer
+
+    def expired(self):
+        """
+        Whether the deadline has passed, checked every check_interval
+        calls. Searches poll this and return as soon as it is True.
+        """
+        if self.stopped:
+            return True
+        if self.deadline is None:
+            return False
+        self.polls += 1
+        if self.polls >= self.check_interval:
+            self.polls = 0
+            if time.perf_counter() >= self.deadline:
+                self.stopped = True
+        return self.stopped
+
+    def stop(self):
+        """ Make every search that polls this stop now """
+        self.stopped = True
+
+    def remaining(self):
+        """ Seconds until the deadline, None if there is none """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def soft_expired(self):
+        """
+        Whether an iterative search should start no new iteration: the
+        deadline has passed or most of the time is used up.
+        """
+        if self.stopped or self.deadline is None:
+            return self.stopped
+        now = time.perf_counter()
+        return now - self.start >= SOFT_SHARE * (self.deadline - self.start)
+
+
+# the time manager of searches without a time limit
+NO_DEADLINE = TimeManager()